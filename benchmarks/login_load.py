@@ -0,0 +1,85 @@
+"""
+Latency of an unrelated endpoint while logins are under load.
+
+Keeps a number of concurrent /auth/login requests running against a live
+server and probes another endpoint at a fixed rate, then prints the probe
+latency percentiles with and without the login burst.
+
+    python benchmarks/login_load.py --email admin@example.com --password secret
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, round(p / 100 * (len(values) - 1)))
+    return values[index]
+
+
+async def probe(client, path, duration, interval):
+    # time the unrelated endpoint at a fixed rate
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login_loop(client, email, password, stop: asyncio.Event, counter: list):
+    while not stop.is_set():
+        response = await client.post(
+            "/auth/login", data={"username": email, "password": password}
+        )
+        response.raise_for_status()
+        counter[0] += 1
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.logins + 10)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=60
+    ) as client:
+        idle = await probe(client, args.path, args.duration, args.interval)
+
+        stop = asyncio.Event()
+        counter = [0]
+        logins = [
+            asyncio.create_task(
+                login_loop(client, args.email, args.password, stop, counter)
+            )
+            for _ in range(args.logins)
+        ]
+        loaded = await probe(client, args.path, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*logins)
+
+    print(f"probe {args.path}, {args.logins} concurrent logins")
+    for name, latencies in (("idle", idle), ("under login load", loaded)):
+        print(
+            f"  {name:<17} n={len(latencies):<5} "
+            f"p50={percentile(latencies, 50):7.1f}ms "
+            f"p99={percentile(latencies, 99):7.1f}ms "
+            f"max={max(latencies):7.1f}ms"
+        )
+    print(f"  logins/s          {counter[0] / args.duration:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", default="/labs/list?limit=1")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Worker startup time and database round trips.
+
+Starts fresh processes that import the app and run its startup and shutdown,
+the way every uvicorn or gunicorn worker does, and prints the import and
+startup times and the statements sent to the database. --create-all also
+runs the create_all the app used to do at startup, for comparison.
+
+    python benchmarks/startup_time.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import asyncio, json, sys, time
+
+start = time.perf_counter()
+import main
+from database import Base, engine
+from sqlalchemy import event
+imported = time.perf_counter() - start
+
+statements = []
+event.listen(
+    engine.sync_engine,
+    "before_cursor_execute",
+    lambda conn, cursor, statement, *args: statements.append(statement),
+)
+
+async def boot(create_all):
+    start = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        if create_all:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        started = time.perf_counter() - start
+    await engine.dispose()
+    return started
+
+started = asyncio.run(boot(sys.argv[1] == "1"))
+print(json.dumps({"import": imported, "startup": started, "statements": statements}))
+"""
+
+
+def run_child(create_all: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, "1" if create_all else "0"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--create-all", action="store_true")
+    args = parser.parse_args()
+
+    results = [run_child(args.create_all) for _ in range(args.runs)]
+    imports = [result["import"] * 1000 for result in results]
+    startups = [result["startup"] * 1000 for result in results]
+    statements = results[-1]["statements"]
+    ddl = [s for s in statements if s.lstrip().upper().startswith(("CREATE", "ALTER"))]
+
+    mode = "startup + create_all" if args.create_all else "startup"
+    print(f"{mode}, {args.runs} runs")
+    print(f"  import      median={statistics.median(imports):7.1f}ms max={max(imports):7.1f}ms")
+    print(f"  startup     median={statistics.median(startups):7.1f}ms max={max(startups):7.1f}ms")
+    print(f"  statements  {len(statements)} ({len(ddl)} DDL)")
@@ -1,9 +1,16 @@
+import asyncio
 import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import calendar
 
+from settings import settings
+
 INFOBIP_API_URL = "https://xk85nl.api.infobip.com/whatsapp/1/message/template"
 INFOBIP_API_TOKEN = (
     "05704a467eaab51ea1bd2aabaa652517-c006af8e-55e6-4254-aa46-440344a6e040"
@@ -164,3 +171,68 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         bool: Returns true if the password matches the hash, false otherwise
     """
     return pwd_context.verify(plain_password, hashed_password)
+
+
+# argon2 runs in C with the GIL released, so hashing threads run in parallel;
+# each hash also holds its memory cost (64 MiB) while running
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+
+# niceness added to the hashing threads, so the event loop wins a busy CPU
+PASSWORD_HASH_NICE = 10
+
+_hash_pool: ThreadPoolExecutor | None = None
+
+
+def _lower_priority():
+    # per thread on Linux only, elsewhere this would renice the whole process
+    if sys.platform.startswith("linux"):
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PASSWORD_HASH_NICE)
+
+
+def get_hash_pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash",
+            initializer=_lower_priority,
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a plain password on the bounded hashing pool, off the event loop
+
+    Args:
+        password (string): The password to hash.
+
+    Returns:
+        string: The hashed password string.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_pool(), hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a plain password against a hash on the bounded hashing pool, off
+    the event loop
+
+    Args:
+        plain_password (string): The plain password to verify.
+        hashed_password (string): The password hash to verify against.
+    Returns:
+        bool: Returns true if the password matches the hash, false otherwise
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_pool(), verify_password, plain_password, hashed_password
+    )
@@ -0,0 +1,126 @@
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import noload
+
+import helpers.assist as assist
+from database import get_db
+from models.user_model import User, UserDB
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+
+# verified tokens kept, least recently used are dropped first
+TOKEN_CACHE_SIZE = 1024
+
+# seconds a verified token is trusted before it is verified again, bounds how
+# stale other worker processes can get since invalidation is per process
+TOKEN_CACHE_TTL = 300
+
+# token to (expires at, user)
+_tokens: "OrderedDict[str, tuple]" = OrderedDict()
+
+# user id to its cached tokens
+_user_tokens: dict = {}
+
+
+def _unauthorized(detail: str):
+    return HTTPException(
+        status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+def _forget(token: str):
+    _, user = _tokens.pop(token)
+    tokens = _user_tokens.get(user.id)
+    if tokens is not None:
+        tokens.discard(token)
+        if not tokens:
+            del _user_tokens[user.id]
+
+
+def _remember(token: str, expires_at: float, user: User):
+    _tokens[token] = (expires_at, user)
+    _user_tokens.setdefault(user.id, set()).add(token)
+
+    while len(_tokens) > TOKEN_CACHE_SIZE:
+        _forget(next(iter(_tokens)))
+
+
+def is_admin_token(token: str) -> bool:
+    """
+    Check a bearer token is valid and was issued to an administrator, from
+    its claims alone, without a database lookup
+
+    Returns:
+        bool: True for a valid administrator token.
+    """
+    try:
+        claims = jwt.decode(token, assist.SECRET_KEY, algorithms=[assist.ALGORITHM])
+    except JWTError:
+        return False
+    return claims.get("role") == assist.USER_ADMIN
+
+
+def invalidate_user(user_id: int):
+    """
+    Drop the cached tokens of a user, call after the user is updated
+    """
+    for token in list(_user_tokens.get(user_id, ())):
+        _forget(token)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+) -> User:
+    """
+    Dependency resolving the user of the bearer token. Verified tokens are
+    cached, so repeated requests skip the signature check and the user lookup.
+
+    Returns:
+        User: The token user.
+    """
+    now = time.time()
+    cached = _tokens.get(token)
+    if cached is not None:
+        expires_at, user = cached
+        if now < expires_at:
+            _tokens.move_to_end(token)
+            return user
+        _forget(token)
+
+    try:
+        claims = jwt.decode(token, assist.SECRET_KEY, algorithms=[assist.ALGORITHM])
+        user_id = int(claims["userid"])
+        expires_at = min(float(claims["exp"]), now + TOKEN_CACHE_TTL)
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise _unauthorized("The specified token is invalid or has expired")
+
+    result = await db.execute(
+        select(UserDB).options(noload("*")).where(UserDB.id == user_id)
+    )
+    db_user = result.scalars().first()
+    if not db_user:
+        raise _unauthorized("The specified token is invalid or has expired")
+
+    user = User.from_orm(db_user)
+    _remember(token, expires_at, user)
+    return user
+
+
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    """
+    Dependency resolving the bearer token user, who must be an administrator
+
+    Returns:
+        User: The token user.
+    """
+    if user.role != assist.USER_ADMIN:
+        raise HTTPException(
+            status_code=403, detail="The specified user is not an administrator"
+        )
+    return user
@@ -0,0 +1,84 @@
+import hashlib
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import noload
+
+from helpers import serializers
+from models.instrument_model import Instrument, InstrumentDB
+from models.lab_model import Lab, LabDB
+from models.reagent_model import Reagent, ReagentDB
+
+# seconds before a cached catalog is reloaded even without a bump, bounds how
+# stale other worker processes can get since the counter is per process
+CACHE_TTL = 300
+
+version = 0
+
+_cache = {
+    "version": -1,
+    "loaded_at": 0.0,
+    "labs": [],
+    "reagents": [],
+    "instruments": [],
+    "etag": None,
+}
+
+
+def _etag(labs: list, reagents: list, instruments: list) -> str:
+    # digest of the cached content, so the tag always matches the body served
+    content = serializers.dumps(
+        [
+            [lab.dict() for lab in labs],
+            [reagent.dict() for reagent in reagents],
+            [instrument.dict() for instrument in instruments],
+        ]
+    )
+    return f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+def bump():
+    """
+    Invalidate the cached catalogs, call after lab, reagent or instrument writes
+    """
+    global version
+    version += 1
+
+
+async def get_catalog(db: AsyncSession):
+    """
+    Get the serialized lab, reagent and instrument catalogs, loading them only
+    when the version changed
+
+    Returns:
+        dict: The labs, reagents and instruments lists, and the ETag of
+        their content.
+    """
+    expired = time.monotonic() - _cache["loaded_at"] > CACHE_TTL
+    if _cache["version"] != version or expired:
+        # a bump while loading leaves the cache outdated for the next request
+        loading = version
+
+        # relationships are not part of the catalog schemas
+        result = await db.execute(select(LabDB).options(noload("*")))
+        labs = [Lab.from_orm(lab) for lab in result.scalars().all()]
+
+        result = await db.execute(select(ReagentDB).options(noload("*")))
+        reagents = [Reagent.from_orm(reagent) for reagent in result.scalars().all()]
+
+        result = await db.execute(select(InstrumentDB).options(noload("*")))
+        instruments = [
+            Instrument.from_orm(instrument) for instrument in result.scalars().all()
+        ]
+
+        _cache.update(
+            version=loading,
+            loaded_at=time.monotonic(),
+            labs=labs,
+            reagents=reagents,
+            instruments=instruments,
+            etag=_etag(labs, reagents, instruments),
+        )
+
+    return _cache
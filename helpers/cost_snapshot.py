@@ -0,0 +1,546 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, column, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from helpers import costing
+from models.instrument_model import InstrumentDB
+from models.reagent_model import ReagentDB
+from models.test_cost_model import TestCostDB
+from models.test_instrument_model import TestInstrumentDB
+from models.test_model import TestDB
+from models.test_reagent_model import TestReagentDB
+
+# keeps each bulk statement below the asyncpg bind parameter limit
+UPSERT_BATCH_SIZE = 1000
+
+
+async def load_links(db: AsyncSession, test_ids=None):
+    """
+    Load the reagent and instrument links of the tests joined with their catalog
+    rows
+
+    Args:
+        db (AsyncSession): The database session.
+        test_ids (list): Optional test ids to restrict the load to.
+
+    Returns:
+        tuple: The reagent and instrument catalogs indexed by id and the
+        (test id, component id) pairs.
+    """
+    query = (
+        select(
+            TestReagentDB.test_id,
+            ReagentDB.id,
+            ReagentDB.name,
+            ReagentDB.cost,
+            ReagentDB.expiry_period,
+            ReagentDB.generic_reagent_unit,
+            ReagentDB.quantity_per_gru,
+            ReagentDB.tests_per_gru,
+        )
+        .join(ReagentDB, ReagentDB.id == TestReagentDB.reagent_id)
+        .order_by(TestReagentDB.test_id, TestReagentDB.id)
+    )
+    if test_ids is not None:
+        query = query.where(TestReagentDB.test_id.in_(test_ids))
+    result = await db.execute(query)
+    rows = result.all()
+    reagents = {row.id: row for row in rows}
+    reagent_pairs = [(row.test_id, row.id) for row in rows]
+
+    query = (
+        select(
+            TestInstrumentDB.test_id,
+            InstrumentDB.id,
+            InstrumentDB.name,
+            InstrumentDB.total_cost,
+        )
+        .join(InstrumentDB, InstrumentDB.id == TestInstrumentDB.instrument_id)
+        .order_by(TestInstrumentDB.test_id, TestInstrumentDB.id)
+    )
+    if test_ids is not None:
+        query = query.where(TestInstrumentDB.test_id.in_(test_ids))
+    result = await db.execute(query)
+    rows = result.all()
+    instruments = {row.id: row for row in rows}
+    instrument_pairs = [(row.test_id, row.id) for row in rows]
+
+    return reagents, instruments, reagent_pairs, instrument_pairs
+
+
+async def load_costing_input(db: AsyncSession):
+    """
+    Load every test with its links and build the costing arrays
+
+    Returns:
+        tuple: The test rows and their CostingInput.
+    """
+    result = await db.execute(
+        select(
+            TestDB.id,
+            TestDB.lab_id,
+            TestDB.name,
+            TestDB.annual_credit,
+            TestDB.annual_nhima,
+            TestDB.annual_research,
+            TestDB.annual_walkins,
+            TestDB.annual_total,
+        ).order_by(TestDB.id)
+    )
+    tests = result.all()
+
+    links = await load_links(db)
+    return tests, costing.build_costing_input(tests, *links)
+
+
+async def sync_test_links(db: AsyncSession, test_ids):
+    """
+    Rewrite the test_reagents/test_instrument rows of the tests from their
+    reagent and instrument lists, one bulk insert per table. Items that
+    reference unknown reagents/instruments are skipped. The test rows are
+    locked first, so concurrent rewrites of a test run one after the other
+    rather than both re-inserting its links.
+    """
+    test_ids = list(test_ids)
+    if not test_ids:
+        return
+
+    result = await db.execute(
+        select(
+            TestDB.id,
+            TestDB.user_id,
+            TestDB.annual_total,
+            TestDB.reagent_list,
+            TestDB.instrument_list,
+            TestDB.created_by,
+        )
+        .where(TestDB.id.in_(test_ids))
+        # in id order, so writers locking several tests do not deadlock
+        .order_by(TestDB.id)
+        .with_for_update()
+    )
+    tests = result.all()
+
+    reagent_ids = {item["id"] for test in tests for item in test.reagent_list or []}
+    instrument_ids = {
+        item["id"] for test in tests for item in test.instrument_list or []
+    }
+    result = await db.execute(select(ReagentDB.id).where(ReagentDB.id.in_(reagent_ids)))
+    reagent_ids = set(result.scalars().all())
+    result = await db.execute(
+        select(InstrumentDB.id).where(InstrumentDB.id.in_(instrument_ids))
+    )
+    instrument_ids = set(result.scalars().all())
+
+    reagent_rows = [
+        {
+            "user_id": test.user_id,
+            "test_id": test.id,
+            "reagent_id": item["id"],
+            "test_no": test.annual_total,
+            "actual_test_no": 0,
+            "actual_test_cost": 0,
+            "created_by": test.created_by,
+        }
+        for test in tests
+        for item in test.reagent_list or []
+        if item["id"] in reagent_ids
+    ]
+    instrument_rows = [
+        {
+            "user_id": test.user_id,
+            "test_id": test.id,
+            "instrument_id": item["id"],
+            "annual_volume": test.annual_total,
+            "percent_volume": item.get("percent_volume") or 0,
+            "annual_cost": 0,
+            "created_by": test.created_by,
+        }
+        for test in tests
+        for item in test.instrument_list or []
+        if item["id"] in instrument_ids
+    ]
+
+    await db.execute(delete(TestReagentDB).where(TestReagentDB.test_id.in_(test_ids)))
+    await db.execute(
+        delete(TestInstrumentDB).where(TestInstrumentDB.test_id.in_(test_ids))
+    )
+    for start in range(0, len(reagent_rows), UPSERT_BATCH_SIZE):
+        await db.execute(
+            insert(TestReagentDB).values(reagent_rows[start : start + UPSERT_BATCH_SIZE])
+        )
+    for start in range(0, len(instrument_rows), UPSERT_BATCH_SIZE):
+        await db.execute(
+            insert(TestInstrumentDB).values(
+                instrument_rows[start : start + UPSERT_BATCH_SIZE]
+            )
+        )
+
+
+async def sync_list_item(db: AsyncSession, column_name: str, old, new, fields: dict):
+    """
+    Mirror a link written through /testreagents or /testinstruments onto the
+    reagent/instrument list of its test, so the next tests/update keeps it.
+    The item keeps its client fields and, within the same test, its position.
+
+    Args:
+        db (AsyncSession): The database session.
+        column_name (str): The list column, reagent_list or instrument_list.
+        old (tuple): The (test id, component id) of the link before the write,
+        None when it is created.
+        new (tuple): The (test id, component id) of the link after the write.
+        fields (dict): The item fields taken from the link.
+    """
+    list_column = getattr(TestDB, column_name)
+    test_ids = {new[0]} if old is None else {old[0], new[0]}
+    # locked, so a concurrent list or link rewrite does not lose this item
+    result = await db.execute(
+        select(TestDB.id, list_column)
+        .where(TestDB.id.in_(test_ids))
+        .order_by(TestDB.id)
+        .with_for_update()
+    )
+    lists = {row[0]: [dict(item) for item in row[1] or []] for row in result.all()}
+    if new[0] not in lists:
+        # unknown test, the link write fails on its foreign key
+        return
+
+    item = {}
+    position = None
+    if old is not None and old[0] in lists:
+        items = lists[old[0]]
+        position = next(
+            (i for i, candidate in enumerate(items) if candidate.get("id") == old[1]),
+            None,
+        )
+        if position is not None:
+            item = items.pop(position)
+        if old[0] != new[0]:
+            position = None
+
+    items = lists[new[0]]
+    item = {**item, "id": new[1], **fields}
+    items.insert(len(items) if position is None else position, item)
+
+    for test_id, items in lists.items():
+        await db.execute(
+            update(TestDB).where(TestDB.id == test_id).values({column_name: items})
+        )
+
+
+def _update_instrument_items(data: costing.CostingInput):
+    # write the catalog instrument costs onto the matched items
+    for item, ref in zip(data.instrument_items, data.instrument_pair_ref.tolist()):
+        instrument = data.instruments[ref]
+        item["name"] = instrument.name
+        item["total_cost"] = instrument.total_cost
+        item["annual_cost"] = instrument.total_cost
+
+
+def _update_reagent_items(
+    tests, data: costing.CostingInput, costs: costing.CostingResult
+):
+    # write the computed reagent costs back onto the matched items; the
+    # counts come from the rows, not the float arrays, so they stay ints
+    for item, test_ref, ref, consumed, cost_per_test, total_cost in zip(
+        data.reagent_items,
+        data.reagent_pair_test.tolist(),
+        data.reagent_pair_ref.tolist(),
+        costs.reagent_consumed.tolist(),
+        costs.reagent_cost_per_test.tolist(),
+        costs.reagent_total_cost.tolist(),
+    ):
+        reagent = data.reagents[ref]
+        item["name"] = reagent.name
+        item["cost"] = reagent.cost
+        item["expiry_period"] = reagent.expiry_period
+        item["generic_reagent_unit"] = reagent.generic_reagent_unit
+        item["quantity_per_gru"] = reagent.quantity_per_gru
+        item["tests_per_grud"] = reagent.tests_per_gru
+        item["test_actual"] = tests[test_ref].annual_total
+        # an int 0 when no test is usable, as the per-item formula gives
+        item["gru_consumed"] = consumed if consumed > 0 else 0
+        item["cost_per_test"] = cost_per_test
+        item["total_cost"] = total_cost
+
+
+async def _update_link_costs(db: AsyncSession, tests, data: costing.CostingInput):
+    # store the computed quantities and costs on the link rows
+    test_ids = [test.id for test in tests]
+    annual_total = [test.annual_total for test in tests]
+
+    reagent_params = [
+        {
+            "b_test_id": test_ids[test_ref],
+            "b_reagent_id": item["id"],
+            "b_test_no": annual_total[test_ref],
+            "b_actual_test_no": item["gru_consumed"],
+            "b_actual_test_cost": item["total_cost"],
+        }
+        for test_ref, item in zip(data.reagent_pair_test.tolist(), data.reagent_items)
+    ]
+    if reagent_params:
+        await db.execute(
+            update(TestReagentDB)
+            .where(
+                TestReagentDB.test_id == bindparam("b_test_id"),
+                TestReagentDB.reagent_id == bindparam("b_reagent_id"),
+            )
+            .values(
+                test_no=bindparam("b_test_no"),
+                actual_test_no=bindparam("b_actual_test_no"),
+                actual_test_cost=bindparam("b_actual_test_cost"),
+            ),
+            reagent_params,
+        )
+
+    instrument_params = [
+        {
+            "b_test_id": test_ids[test_ref],
+            "b_instrument_id": item["id"],
+            "b_annual_volume": annual_total[test_ref],
+            "b_annual_cost": item["annual_cost"],
+        }
+        for test_ref, item in zip(
+            data.instrument_pair_test.tolist(), data.instrument_items
+        )
+    ]
+    if instrument_params:
+        await db.execute(
+            update(TestInstrumentDB)
+            .where(
+                TestInstrumentDB.test_id == bindparam("b_test_id"),
+                TestInstrumentDB.instrument_id == bindparam("b_instrument_id"),
+            )
+            .values(
+                annual_volume=bindparam("b_annual_volume"),
+                annual_cost=bindparam("b_annual_cost"),
+            ),
+            instrument_params,
+        )
+
+
+def _snapshot_items(lists, pair_test, items):
+    # lay the costed items over the tests' own list items, keeping their client
+    # fields, their order and the items whose component does not exist
+    costed = {}
+    for test_ref, item in zip(pair_test.tolist(), items):
+        costed.setdefault((test_ref, item["id"]), []).append(item)
+
+    grouped = []
+    for test_ref, test_items in enumerate(lists):
+        merged = []
+        for original in test_items or []:
+            matches = costed.get((test_ref, original.get("id")))
+            merged.append({**original, **matches.pop(0)} if matches else dict(original))
+        grouped.append(merged)
+    return grouped
+
+
+async def refresh_test_costs(db: AsyncSession, test_ids=None):
+    """
+    Recompute the cost snapshot and link costs of the specified tests from
+    their test_reagents/test_instrument links. The caller owns the transaction
+    and must commit.
+
+    Args:
+        db (AsyncSession): The database session.
+        test_ids (list): The ids of the tests to recompute, all tests if None.
+    """
+    if test_ids is not None:
+        test_ids = list(test_ids)
+        if len(test_ids) == 0:
+            return
+
+        if len(test_ids) > UPSERT_BATCH_SIZE:
+            for start in range(0, len(test_ids), UPSERT_BATCH_SIZE):
+                await refresh_test_costs(
+                    db, test_ids[start : start + UPSERT_BATCH_SIZE]
+                )
+            return
+
+    query = select(
+        TestDB.id,
+        TestDB.lab_id,
+        TestDB.name,
+        TestDB.annual_total,
+        TestDB.reagent_list,
+        TestDB.instrument_list,
+    ).order_by(TestDB.id)
+    if test_ids is not None:
+        query = query.where(TestDB.id.in_(test_ids))
+    result = await db.execute(query)
+    tests = result.all()
+
+    if not tests:
+        return
+
+    links = await load_links(db, test_ids)
+    data = costing.build_costing_input(tests, *links)
+    costs = costing.compute_costs(data)
+
+    _update_reagent_items(tests, data, costs)
+    _update_instrument_items(data)
+
+    # group the costed items per test, following the test's own lists
+    reagent_items = _snapshot_items(
+        [test.reagent_list for test in tests],
+        data.reagent_pair_test,
+        data.reagent_items,
+    )
+    instrument_items = _snapshot_items(
+        [test.instrument_list for test in tests],
+        data.instrument_pair_test,
+        data.instrument_items,
+    )
+
+    await _update_link_costs(db, tests, data)
+
+    now = datetime.now()
+    reagent_cost = costs.reagent_cost.tolist()
+    instrument_cost = costs.instrument_cost.tolist()
+    total_cost = costs.total_cost.tolist()
+    rows = [
+        {
+            "test_id": test.id,
+            "lab_id": test.lab_id,
+            "name": test.name,
+            "annual_total": test.annual_total,
+            "reagent_cost": reagent_cost[i],
+            "instrument_cost": instrument_cost[i],
+            "total_cost": total_cost[i],
+            "reagent_items": reagent_items[i],
+            "instrument_items": instrument_items[i],
+            "computed_at": now,
+        }
+        for i, test in enumerate(tests)
+    ]
+
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(TestCostDB).values(rows[start : start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TestCostDB.test_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in rows[0].keys()
+                if column != "test_id"
+            },
+        )
+        await db.execute(stmt)
+
+
+def _stale_links(list_column, catalog, link_model):
+    # the list items referencing existing components and the test's link rows
+    # differ in number, so the links were never written or are out of date
+    item = func.jsonb_array_elements(list_column).table_valued(
+        column("value", JSONB)
+    ).alias("item")
+    listed = (
+        select(func.count())
+        .select_from(item)
+        .join(catalog, func.to_jsonb(catalog.id) == item.c.value["id"])
+        .scalar_subquery()
+    )
+    linked = (
+        select(func.count())
+        .select_from(link_model)
+        .where(link_model.test_id == TestDB.id)
+        .scalar_subquery()
+    )
+    return listed != linked
+
+
+async def refresh_missing_test_costs(db: AsyncSession):
+    """
+    Link and compute the tests that do not have a snapshot yet, or whose link
+    rows do not match the existing components of their lists. A one-off
+    backfill for data written before the write paths kept them in step, run
+    with `python -m migrations backfill-costs`; it scans every test list.
+    The caller owns the transaction and must commit.
+
+    Returns:
+        int: The number of tests linked and costed.
+    """
+    result = await db.execute(
+        select(TestDB.id)
+        .outerjoin(TestCostDB, TestCostDB.test_id == TestDB.id)
+        .where(
+            or_(
+                TestCostDB.id.is_(None),
+                _stale_links(TestDB.reagent_list, ReagentDB, TestReagentDB),
+                _stale_links(
+                    TestDB.instrument_list, InstrumentDB, TestInstrumentDB
+                ),
+            )
+        )
+    )
+    test_ids = result.scalars().all()
+
+    for start in range(0, len(test_ids), UPSERT_BATCH_SIZE):
+        await sync_test_links(db, test_ids[start : start + UPSERT_BATCH_SIZE])
+    await refresh_test_costs(db, test_ids)
+    return len(test_ids)
+
+
+async def get_reagent_test_ids(db: AsyncSession, reagent_id: int):
+    """
+    Get the ids of the tests linked to the reagent
+    """
+    result = await db.execute(
+        select(TestReagentDB.test_id)
+        .where(TestReagentDB.reagent_id == reagent_id)
+        .distinct()
+    )
+    return result.scalars().all()
+
+
+async def get_instrument_test_ids(db: AsyncSession, instrument_id: int):
+    """
+    Get the ids of the tests linked to the instrument
+    """
+    result = await db.execute(
+        select(TestInstrumentDB.test_id)
+        .where(TestInstrumentDB.instrument_id == instrument_id)
+        .distinct()
+    )
+    return result.scalars().all()
+
+
+async def link_reagent_tests(db: AsyncSession, reagent_id: int):
+    """
+    Link the tests whose reagent list already references a newly created
+    reagent, as their items were skipped while it did not exist
+
+    Returns:
+        list: The ids of the linked tests.
+    """
+    result = await db.execute(
+        select(TestDB.id).where(TestDB.reagent_list.contains([{"id": reagent_id}]))
+    )
+    test_ids = result.scalars().all()
+    for start in range(0, len(test_ids), UPSERT_BATCH_SIZE):
+        await sync_test_links(db, test_ids[start : start + UPSERT_BATCH_SIZE])
+    return test_ids
+
+
+async def link_instrument_tests(db: AsyncSession, instrument_id: int):
+    """
+    Link the tests whose instrument list already references a newly created
+    instrument, as their items were skipped while it did not exist
+
+    Returns:
+        list: The ids of the linked tests.
+    """
+    result = await db.execute(
+        select(TestDB.id).where(
+            TestDB.instrument_list.contains([{"id": instrument_id}])
+        )
+    )
+    test_ids = result.scalars().all()
+    for start in range(0, len(test_ids), UPSERT_BATCH_SIZE):
+        await sync_test_links(db, test_ids[start : start + UPSERT_BATCH_SIZE])
+    return test_ids
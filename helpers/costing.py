@@ -0,0 +1,275 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+DAYS_PER_YEAR = 365
+
+
+@dataclass
+class CostingInput:
+    """
+    Test x reagent and test x instrument usage in coordinate form.
+
+    Each test_reagents/test_instrument link of a test is one "pair". Pairs are stored in
+    test order so per-test totals can be reduced with np.add.reduceat.
+    """
+
+    # tests
+    test_ids: np.ndarray
+    annual_total: np.ndarray
+
+    # catalog rows and one item dict per pair, in array order
+    reagents: list
+    instruments: list
+    reagent_items: list
+    instrument_items: list
+
+    # reagent catalog and test x reagent pairs
+    reagent_ids: np.ndarray
+    reagent_cost: np.ndarray
+    reagent_expiry_period: np.ndarray
+    reagent_tests_per_gru: np.ndarray
+    reagent_pair_test: np.ndarray
+    reagent_pair_ref: np.ndarray
+
+    # instrument catalog and test x instrument pairs
+    instrument_ids: np.ndarray
+    instrument_cost: np.ndarray
+    instrument_pair_test: np.ndarray
+    instrument_pair_ref: np.ndarray
+
+
+@dataclass
+class CostingResult:
+    # per reagent pair
+    reagent_consumed: np.ndarray
+    reagent_cost_per_test: np.ndarray
+    reagent_total_cost: np.ndarray
+
+    # per instrument pair
+    instrument_total_cost: np.ndarray
+
+    # per test
+    reagent_cost: np.ndarray
+    instrument_cost: np.ndarray
+    total_cost: np.ndarray
+
+
+def _index_pairs(pairs, test_index: dict, catalog_index: dict):
+    # map (test id, component id) pairs to array positions, in test order
+    pair_test = np.array([test_index[test_id] for test_id, _ in pairs], dtype=np.intp)
+    pair_ref = np.array([catalog_index[ref] for _, ref in pairs], dtype=np.intp)
+    pair_items = [{"id": ref} for _, ref in pairs]
+
+    order = np.argsort(pair_test, kind="stable")
+    return pair_test[order], pair_ref[order], [pair_items[i] for i in order]
+
+
+def build_costing_input(
+    tests, reagents: dict, instruments: dict, reagent_pairs, instrument_pairs
+) -> CostingInput:
+    """
+    Build the costing arrays for the specified tests
+
+    Args:
+        tests (list): The tests (rows with id and annual_total) to cost.
+        reagents (dict): The reagent catalog indexed by id.
+        instruments (dict): The instrument catalog indexed by id.
+        reagent_pairs (list): The (test id, reagent id) links of the tests.
+        instrument_pairs (list): The (test id, instrument id) links of the tests.
+
+    Returns:
+        CostingInput: The arrays consumed by compute_costs.
+    """
+    reagent_list = list(reagents.values())
+    instrument_list = list(instruments.values())
+
+    test_index = {test.id: i for i, test in enumerate(tests)}
+    reagent_index = {reagent.id: i for i, reagent in enumerate(reagent_list)}
+    instrument_index = {instrument.id: i for i, instrument in enumerate(instrument_list)}
+
+    reagent_pair_test, reagent_pair_ref, reagent_items = _index_pairs(
+        reagent_pairs, test_index, reagent_index
+    )
+    instrument_pair_test, instrument_pair_ref, instrument_items = _index_pairs(
+        instrument_pairs, test_index, instrument_index
+    )
+
+    return CostingInput(
+        test_ids=np.array([test.id for test in tests], dtype=np.int64),
+        annual_total=np.array([test.annual_total for test in tests], dtype=float),
+        reagents=reagent_list,
+        instruments=instrument_list,
+        reagent_items=reagent_items,
+        instrument_items=instrument_items,
+        reagent_ids=np.array([r.id for r in reagent_list], dtype=np.int64),
+        reagent_cost=np.array([r.cost for r in reagent_list], dtype=float),
+        reagent_expiry_period=np.array(
+            [r.expiry_period for r in reagent_list], dtype=float
+        ),
+        reagent_tests_per_gru=np.array(
+            [r.tests_per_gru for r in reagent_list], dtype=float
+        ),
+        reagent_pair_test=reagent_pair_test,
+        reagent_pair_ref=reagent_pair_ref,
+        instrument_ids=np.array([i.id for i in instrument_list], dtype=np.int64),
+        instrument_cost=np.array([i.total_cost for i in instrument_list], dtype=float),
+        instrument_pair_test=instrument_pair_test,
+        instrument_pair_ref=instrument_pair_ref,
+    )
+
+
+def reagent_costs(annual_total, expiry_period, tests_per_gru, cost):
+    """
+    Apply the reagent costing formula element-wise. All arguments broadcast.
+
+    Returns:
+        tuple: The gru consumed, cost per test and total cost arrays.
+    """
+    annual_total, expiry_period, tests_per_gru, cost = np.broadcast_arrays(
+        np.asarray(annual_total, dtype=float),
+        np.asarray(expiry_period, dtype=float),
+        np.asarray(tests_per_gru, dtype=float),
+        np.asarray(cost, dtype=float),
+    )
+
+    tests_within = (annual_total * expiry_period) / DAYS_PER_YEAR
+    tests_usable = np.minimum(tests_within, tests_per_gru)
+
+    consumed = np.divide(
+        annual_total,
+        tests_usable,
+        out=np.zeros(annual_total.shape),
+        where=tests_usable > 0,
+    )
+    cost_per_unit = np.divide(
+        consumed,
+        annual_total,
+        out=np.zeros(annual_total.shape),
+        where=annual_total > 0,
+    )
+    cost_per_test = cost_per_unit * cost
+    total_cost = cost_per_test * annual_total
+
+    return consumed, cost_per_test, total_cost
+
+
+def sum_by_test(values: np.ndarray, pair_test: np.ndarray, n_tests: int) -> np.ndarray:
+    """
+    Sum pair values per test along the last axis; pairs must be in test order.
+    """
+    out = np.zeros(values.shape[:-1] + (n_tests,))
+    if pair_test.size == 0:
+        return out
+
+    starts = np.flatnonzero(np.r_[True, pair_test[1:] != pair_test[:-1]])
+    out[..., pair_test[starts]] = np.add.reduceat(values, starts, axis=-1)
+    return out
+
+
+def compute_costs(
+    data: CostingInput,
+    annual_total=None,
+    reagent_cost=None,
+    instrument_cost=None,
+    reagent_expiry_period=None,
+) -> CostingResult:
+    """
+    Compute every reagent and instrument component cost in one batched pass
+
+    Args:
+        data (CostingInput): The costing arrays.
+        annual_total (ndarray): Optional annual totals per test, may carry
+            leading (e.g. scenario) axes.
+        reagent_cost (ndarray): Optional cost per catalog reagent, may carry
+            leading axes.
+        instrument_cost (ndarray): Optional cost per catalog instrument, may
+            carry leading axes.
+        reagent_expiry_period (ndarray): Optional expiry period per catalog
+            reagent, may carry leading axes.
+
+    Returns:
+        CostingResult: Per pair and per test costs.
+    """
+    annual_total = data.annual_total if annual_total is None else annual_total
+    reagent_cost = data.reagent_cost if reagent_cost is None else reagent_cost
+    instrument_cost = (
+        data.instrument_cost if instrument_cost is None else instrument_cost
+    )
+    reagent_expiry_period = (
+        data.reagent_expiry_period
+        if reagent_expiry_period is None
+        else reagent_expiry_period
+    )
+    annual_total = np.asarray(annual_total, dtype=float)
+    n_tests = data.test_ids.size
+
+    # reagents
+    pair_ref = data.reagent_pair_ref
+    consumed, cost_per_test, reagent_total = reagent_costs(
+        annual_total[..., data.reagent_pair_test],
+        np.asarray(reagent_expiry_period, dtype=float)[..., pair_ref],
+        data.reagent_tests_per_gru[pair_ref],
+        np.asarray(reagent_cost, dtype=float)[..., pair_ref],
+    )
+
+    # instruments
+    instrument_total = np.asarray(instrument_cost, dtype=float)[
+        ..., data.instrument_pair_ref
+    ]
+
+    reagent_by_test = sum_by_test(reagent_total, data.reagent_pair_test, n_tests)
+    instrument_by_test = sum_by_test(
+        instrument_total, data.instrument_pair_test, n_tests
+    )
+    reagent_by_test, instrument_by_test = np.broadcast_arrays(
+        reagent_by_test, instrument_by_test
+    )
+
+    return CostingResult(
+        reagent_consumed=consumed,
+        reagent_cost_per_test=cost_per_test,
+        reagent_total_cost=reagent_total,
+        instrument_total_cost=instrument_total,
+        reagent_cost=reagent_by_test,
+        instrument_cost=instrument_by_test,
+        total_cost=reagent_by_test + instrument_by_test,
+    )
+
+
+def scenario_totals(
+    data: CostingInput,
+    annual_total: np.ndarray,
+    reagent_cost: np.ndarray,
+    instrument_cost: np.ndarray,
+    chunk_size: int = 256,
+):
+    """
+    Compute the catalog-wide costs of many scenarios
+
+    Args:
+        data (CostingInput): The costing arrays.
+        annual_total (ndarray): Annual totals per scenario and test (S, N).
+        reagent_cost (ndarray): Reagent costs per scenario and reagent (S, M).
+        instrument_cost (ndarray): Instrument costs per scenario and instrument (S, K).
+        chunk_size (int): Scenarios evaluated per batch, bounds memory use.
+
+    Returns:
+        tuple: The reagent, instrument and total cost of each scenario (S,).
+    """
+    n_scenarios = annual_total.shape[0]
+    reagent_totals = np.zeros(n_scenarios)
+    instrument_totals = np.zeros(n_scenarios)
+
+    for start in range(0, n_scenarios, chunk_size):
+        end = start + chunk_size
+        costs = compute_costs(
+            data,
+            annual_total=annual_total[start:end],
+            reagent_cost=reagent_cost[start:end],
+            instrument_cost=instrument_cost[start:end],
+        )
+        reagent_totals[start:end] = costs.reagent_cost.sum(axis=-1)
+        instrument_totals[start:end] = costs.instrument_cost.sum(axis=-1)
+
+    return reagent_totals, instrument_totals, reagent_totals + instrument_totals
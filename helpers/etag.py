@@ -0,0 +1,65 @@
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+
+async def table_etag(db: AsyncSession, request: Request, *models) -> str:
+    """
+    Build a strong ETag from the change stamp of the specified tables, that is
+    the latest updated_at/created_at and the row count of each, plus the query
+    string of the request. Runs a single query and loads no rows.
+
+    Returns:
+        string: The quoted ETag.
+    """
+    columns = []
+    for model in models:
+        columns.append(
+            select(func.max(func.coalesce(model.updated_at, model.created_at)))
+            .scalar_subquery()
+        )
+        columns.append(select(func.count()).select_from(model).scalar_subquery())
+
+    result = await db.execute(select(*columns))
+    stamp = [str(value) for value in result.one()]
+    stamp.append(request.url.path)
+    stamp.append(str(request.url.query))
+
+    digest = hashlib.sha1("|".join(stamp).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+async def check_etag(db: AsyncSession, request: Request, response: Response, *models):
+    """
+    Compare the If-None-Match header against the current ETag of the tables
+
+    Returns:
+        Response: A 304 response when nothing changed, None otherwise, in which
+        case the ETag is set on the response.
+    """
+    etag = await table_etag(db, request, *models)
+    return match_etag(etag, request, response)
+
+
+def match_etag(etag: str, request: Request, response: Response):
+    """
+    Compare the If-None-Match header against a known ETag, e.g. one derived
+    from cached content
+
+    Returns:
+        Response: A 304 response when it matches, None otherwise, in which
+        case the ETag is set on the response.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,405 @@
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import Counter as Tally
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# route label of requests no route matched, so unknown paths can not grow the
+# label set
+UNMATCHED_ROUTE = "unmatched"
+
+# environments flagging statements repeated within a request
+DETECT_REPEATS_ENVS = ("development", "test")
+
+# response header with the most times a statement shape was repeated, set
+# when over the threshold
+REPEATED_STATEMENTS_HEADER = "X-DB-Repeated-Statements"
+
+# paths whose route template is kept, e.g. /tests/id/1
+ROUTE_CACHE_SIZE = 4096
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+
+        # labels to (per bucket counts, sum, count)
+        self.values: dict = {}
+
+    def observe(self, *labels, value: float):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(
+                    f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the response is sent.",
+    ("method", "route"),
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled.", ("method", "route")
+)
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "Database statements executed per HTTP request.",
+    ("method", "route"),
+    buckets=STATEMENT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Database time per HTTP request, summed over its statements.",
+    ("method", "route"),
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time waited for a pooled database connection, including connecting.",
+    ("pool",),
+)
+POOL_SIZE = Gauge("db_pool_size", "Configured connections kept in the pool.", ("pool",))
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Pool connections in use.", ("pool",)
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size.", ("pool",)
+)
+
+# name to engine, for the pool gauges
+_engines: dict = {}
+
+# (method, path) to route template
+_templates: dict = {}
+
+
+# bind parameters and the expanded lists of IN, so statements differing only
+# in their values share a shape
+_PARAMETER = re.compile(r"%s|\$\d+")
+_PARAMETER_LIST = re.compile(r"\?(?:, \?)+")
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAMETER_LIST.sub("?", _PARAMETER.sub("?", statement))
+
+
+class RequestStats:
+    """
+    Database usage of the current request, filled in by the engine events
+    """
+
+    __slots__ = ("route", "statements", "db_seconds", "shapes")
+
+    def __init__(self, route: Optional[str] = None, track_shapes: bool = False):
+        # method and route template, e.g. GET /tests/list
+        self.route = route
+
+        self.statements = 0
+        self.db_seconds = 0.0
+
+        # statement shape to times run, when detecting repeated statements
+        self.shapes: Optional[Tally] = Tally() if track_shapes else None
+
+    def repeated(self, threshold: int) -> list:
+        """
+        Get the statement shapes run more than threshold times, the N+1
+        pattern of a query per loaded row
+
+        Returns:
+            list: (shape, times run) pairs, most repeated first.
+        """
+        if not self.shapes:
+            return []
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+
+# set by the middleware for the duration of each request, SQLAlchemy runs the
+# engine events in greenlets sharing the request's context
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        if stats.shapes is not None:
+            stats.shapes[statement_shape(statement)] += 1
+        if context is not None:
+            context._stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    start = getattr(context, "_stats_start", None)
+    if stats is not None and start is not None:
+        stats.db_seconds += time.perf_counter() - start
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # pool label, set on the subclasses made by timed_pool
+    label = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(self.label, value=time.perf_counter() - start)
+
+
+_pool_classes: dict = {}
+
+
+def timed_pool(label: str):
+    """
+    Get the pool class timing the connection checkouts of an engine. A class
+    per label, since the pool is recreated from its class on dispose.
+
+    Args:
+        label (str): The pool label, e.g. primary or replica.
+
+    Returns:
+        type: The TimedQueuePool subclass.
+    """
+    pool_class = _pool_classes.get(label)
+    if pool_class is None:
+        pool_class = _pool_classes[label] = type(
+            "TimedQueuePool", (TimedQueuePool,), {"label": label}
+        )
+    return pool_class
+
+
+def instrument_engine(engine, label: str):
+    """
+    Count and time the statements of an engine per request and report its
+    pool
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    _engines[label] = engine
+
+
+def render() -> str:
+    """
+    Render all metrics in the Prometheus text format, reading the pool gauges
+    at scrape time
+
+    Returns:
+        str: The exposition text.
+    """
+    for label, engine in _engines.items():
+        pool = engine.pool
+        POOL_SIZE.set(label, value=pool.size())
+        POOL_CHECKED_OUT.set(label, value=pool.checkedout())
+        POOL_OVERFLOW.set(label, value=max(pool.overflow(), 0))
+
+    lines = []
+    for metric in (
+        REQUESTS,
+        REQUEST_SECONDS,
+        IN_FLIGHT,
+        REQUEST_STATEMENTS,
+        REQUEST_DB_SECONDS,
+        POOL_CHECKOUT_SECONDS,
+        POOL_SIZE,
+        POOL_CHECKED_OUT,
+        POOL_OVERFLOW,
+    ):
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def route_template(router, scope) -> str:
+    """
+    Get the path template of the route a request will be routed to, the same
+    way the router matches it. Matching walks every route, so the templates
+    of recent paths are cached.
+
+    Returns:
+        str: The route path, e.g. /tests/id/{id}.
+    """
+    key = (scope["method"], scope["path"])
+    template = _templates.get(key)
+    if template is not None:
+        return template
+
+    partial = None
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            template = route.path
+            break
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    else:
+        template = partial or UNMATCHED_ROUTE
+
+    if len(_templates) >= ROUTE_CACHE_SIZE:
+        _templates.clear()
+    _templates[key] = template
+    return template
+
+
+def server_timing(stats: RequestStats, elapsed: float) -> str:
+    """
+    Format the Server-Timing header of a request, its database time and
+    statements and the time until the response started
+    """
+    return (
+        f'db;desc="{stats.statements} statements";dur={stats.db_seconds * 1000:.2f}, '
+        f"app;dur={elapsed * 1000:.2f}"
+    )
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording the request metrics, labelled by route
+    template. Adds the Server-Timing header, and in development or test
+    flags statements repeated within a request.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+        self.server_timing = settings.server_timing
+        self.repeat_threshold = (
+            settings.db_repeated_statement_threshold
+            if settings.app_env in DETECT_REPEATS_ENVS
+            else 0
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.router, scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # statements after this point, e.g. of a streamed body, are
+                # only in the metrics
+                headers = MutableHeaders(scope=message)
+                if self.server_timing:
+                    elapsed = time.perf_counter() - start
+                    headers.append("Server-Timing", server_timing(stats, elapsed))
+                repeated = stats.repeated(self.repeat_threshold)
+                if repeated:
+                    headers.append(REPEATED_STATEMENTS_HEADER, str(repeated[0][1]))
+            await send(message)
+
+        stats = RequestStats(f"{method} {route}", track_shapes=self.repeat_threshold > 0)
+        token = _request_stats.set(stats)
+        IN_FLIGHT.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.observe(method, route, value=time.perf_counter() - start)
+            REQUESTS.inc(method, route, status)
+            REQUEST_STATEMENTS.observe(method, route, value=stats.statements)
+            REQUEST_DB_SECONDS.observe(method, route, value=stats.db_seconds)
+            IN_FLIGHT.dec(method, route)
+            _request_stats.reset(token)
+
+            for shape, count in stats.repeated(self.repeat_threshold):
+                logger.warning(
+                    "Repeated statement, %s %s ran it %d times: %s",
+                    method,
+                    route,
+                    count,
+                    shape,
+                )
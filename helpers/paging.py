@@ -0,0 +1,170 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import BigInteger, func, literal_column, tuple_
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# range of an Integer column, larger cursor values would fail in asyncpg
+INT32_RANGE = range(-(2**31), 2**31)
+
+# NULL timestamps sort as the earliest one, matching the ix_*_created_at_id
+# expression indexes
+NULL_TIMESTAMP = "'-infinity'::timestamptz"
+
+
+class PageParams:
+    def __init__(self, after: Optional[str], limit: int, sort: str, desc: bool):
+        self.after = after
+        self.limit = limit
+        self.sort = sort
+        self.desc = desc
+
+
+def page_params(
+    after: Optional[str] = Query(None, description="The cursor of the previous page"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    sort: str = Query("id", description="The column to sort by"),
+    desc: bool = False,
+) -> PageParams:
+    """
+    Dependency collecting the keyset pagination query parameters
+    """
+    return PageParams(after=after, limit=limit, sort=sort, desc=desc)
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_cursor(value, id: int) -> str:
+    payload = json.dumps([_encode(value), id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_int(value, column):
+    if type(value) is not int:
+        raise ValueError("not an integer")
+    if not isinstance(column.type, BigInteger) and value not in INT32_RANGE:
+        raise ValueError("integer out of range")
+    return value
+
+
+def _decode_value(value, column):
+    # the cursor value as the column's python type, so a tampered or stale
+    # cursor is rejected here rather than by the database
+    if value is None:
+        if not column.nullable:
+            raise ValueError("null value for a required column")
+        return None
+
+    python_type = column.type.python_type
+    if python_type is datetime:
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is None and column.type.timezone:
+            raise ValueError("naive timestamp")
+        return value
+    if python_type is int:
+        return _decode_int(value, column)
+    if not isinstance(value, python_type):
+        raise ValueError(f"not a {python_type.__name__}")
+    return value
+
+
+def decode_cursor(cursor: str, column):
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        value = _decode_value(value, column)
+        id = _decode_int(id, column.table.c.id)
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Invalid page cursor '{cursor}'")
+
+    return value, id
+
+
+def sort_column(model, page: PageParams, sort_columns):
+    if page.sort not in sort_columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unable to sort by '{page.sort}', use one of {', '.join(sort_columns)}",
+        )
+    return getattr(model, page.sort)
+
+
+def sort_key(column):
+    """
+    Get the expression a column is sorted by. Nullable timestamps are coalesced,
+    since a NULL in the (sort column, id) key would drop those rows from every
+    page after the cursor.
+    """
+    if column.nullable and column.type.python_type is datetime:
+        return func.coalesce(column, literal_column(NULL_TIMESTAMP))
+    return column
+
+
+def paginate(query, model, page: PageParams, sort_columns=("id",)):
+    """
+    Apply keyset pagination on (sort column, id) to the query. One extra row is
+    fetched to know whether there is a next page.
+
+    Args:
+        query (Select): The query to paginate.
+        model (Base): The model whose id breaks ties.
+        page (PageParams): The pagination parameters.
+        sort_columns (tuple): The columns the model can be sorted by, each
+            backed by an index on its sort_key and id.
+
+    Returns:
+        Select: The paginated query.
+    """
+    column = sort_column(model, page, sort_columns)
+    expression = sort_key(column)
+    key = tuple_(expression, model.id) if column is not model.id else model.id
+
+    if page.after:
+        value, id = decode_cursor(page.after, column)
+        if value is None and expression is not column:
+            value = literal_column(NULL_TIMESTAMP)
+        bound = tuple_(value, id) if column is not model.id else id
+        query = query.where(key < bound if page.desc else key > bound)
+
+    if column is model.id:
+        order = [model.id.desc() if page.desc else model.id]
+    else:
+        order = (
+            [expression.desc(), model.id.desc()]
+            if page.desc
+            else [expression, model.id]
+        )
+
+    return query.order_by(*order).limit(page.limit + 1)
+
+
+def page_rows(rows, response: Response, page: PageParams):
+    """
+    Trim the extra row and set the next page cursor header when there is one
+
+    Returns:
+        list: The rows of the page.
+    """
+    rows = list(rows)
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, page.sort), last.id
+        )
+
+    return rows
+
+
+def prefix_pattern(prefix: str) -> str:
+    # LIKE pattern matching the literal prefix
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
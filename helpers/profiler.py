@@ -0,0 +1,156 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+
+from helpers import metrics
+from helpers.auth import is_admin_token
+from settings import settings
+
+# request header or query parameter asking for a profile, cprofile for a
+# deterministic profile, sample (or any other value) for a sampled one
+PROFILE_HEADER = b"x-profile"
+PROFILE_PARAM = "profile"
+
+# response header with the written profile file
+PROFILE_FILE_HEADER = "X-Profile-File"
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+# one profile at a time, profilers see every coroutine on the event loop
+_lock = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """
+    Sample the stacks of a thread at a fixed interval, counting them in the
+    collapsed format of flame graph tools
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def _requested(scope):
+    # profile mode asked for by the request, None when not asked
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1") or "sample"
+
+    query = scope["query_string"]
+    if PROFILE_PARAM.encode() in query:
+        values = parse_qs(query.decode("latin-1")).get(PROFILE_PARAM)
+        if values:
+            return values[0] or "sample"
+    return None
+
+
+def _authorized(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return scheme.lower() == "bearer" and is_admin_token(token)
+    return False
+
+
+def profile_path(scope, route: str, extension: str) -> str:
+    """
+    Get a new file path in the profiles directory for a request profile
+
+    Returns:
+        str: The path, e.g. profiles/20250101T120000000000-GET-tests-list.collapsed.
+    """
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    slug = _SLUG.sub("-", route).strip("-") or "root"
+    name = f"{stamp}-{scope['method']}-{slug}.{extension}"
+    return os.path.join(settings.profiles_dir, name)
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling single requests that ask for it with the
+    X-Profile header or profile query parameter, sent with an administrator
+    bearer token. Other requests pass straight through.
+
+    The profile is written to the profiles directory, a .prof pstats file
+    for cprofile and a .collapsed stack file otherwise, and named in the
+    X-Profile-File response header.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _requested(scope)
+        if mode is None or not _authorized(scope) or not _lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._profile(mode, scope, receive, send)
+        finally:
+            _lock.release()
+
+    async def _profile(self, mode, scope, receive, send):
+        route = metrics.route_template(self.router, scope)
+        path = profile_path(scope, route, "prof" if mode == "cprofile" else "collapsed")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_FILE_HEADER, path)
+            await send(message)
+
+        os.makedirs(settings.profiles_dir, exist_ok=True)
+        if mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.disable()
+                profile.dump_stats(path)
+            return
+
+        sampler = StackSampler(
+            threading.get_ident(), settings.profiler_interval_ms / 1000
+        )
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            with open(path, "w") as file:
+                file.write(sampler.collapsed())
@@ -0,0 +1,176 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.future import select
+
+# label prefix separator of the expanded relationship columns
+SEPARATOR = "__"
+
+
+def schema_columns(model, schema):
+    """
+    Get the model columns backing the scalar fields of a schema
+
+    Args:
+        model (Base): The model to select from.
+        schema (BaseModel): The schema to serialize into.
+
+    Returns:
+        list: The columns, in schema field order.
+    """
+    table_columns = model.__table__.c
+    return [
+        getattr(model, name) for name in schema.__fields__ if name in table_columns
+    ]
+
+
+def parse_expand(expand: Optional[str], relations: dict) -> dict:
+    """
+    Resolve the expand query parameter into the requested relationships
+
+    Args:
+        expand (str): Comma separated relationship names.
+        relations (dict): The expandable relationships, name to
+            (related model, related schema, foreign key column).
+
+    Returns:
+        dict: The requested relationships.
+    """
+    names = [name.strip() for name in (expand or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in relations]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unable to expand '{', '.join(unknown)}', use one of {', '.join(relations)}",
+        )
+
+    return {name: relations[name] for name in names}
+
+
+def select_items(model, schema, expanded: dict):
+    """
+    Build a column-only select of the schema fields, outer joining the
+    expanded relationships into the same statement
+
+    Returns:
+        Select: The query, yielding row tuples rather than entities.
+    """
+    return select_columns(model, schema_columns(model, schema), expanded)
+
+
+def select_columns(model, columns: list, expanded: dict):
+    columns = list(columns)
+    for name, (related, related_schema, _) in expanded.items():
+        columns += [
+            column.label(f"{name}{SEPARATOR}{column.key}")
+            for column in schema_columns(related, related_schema)
+        ]
+
+    query = select(*columns).select_from(model)
+    for related, _, key in expanded.values():
+        query = query.outerjoin(related, related.id == key)
+
+    return query
+
+
+def to_items(rows, expanded: dict) -> list:
+    """
+    Convert rows of select_items into dicts, nesting the expanded
+    relationships
+
+    Returns:
+        list: One dict per row.
+    """
+    nested = {
+        name: [column.key for column in schema_columns(related, related_schema)]
+        for name, (related, related_schema, _) in expanded.items()
+    }
+
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        for name, keys in nested.items():
+            values = {key: item.pop(f"{name}{SEPARATOR}{key}") for key in keys}
+            item[name] = values if values["id"] is not None else None
+        items.append(item)
+
+    return items
+
+
+@dataclass
+class FieldSet:
+    # requested names, in response order
+    names: list
+
+    # requested model columns and relationships
+    columns: list
+    expanded: dict
+
+
+def parse_fields(
+    fields: Optional[str], model, schema, relations: dict, hidden=()
+) -> Optional[FieldSet]:
+    """
+    Resolve the fields query parameter into the columns to select. The id is
+    always returned.
+
+    Args:
+        fields (str): Comma separated field names.
+        model (Base): The model to select from.
+        schema (BaseModel): The full response schema, bounds the fields.
+        relations (dict): The expandable relationships.
+        hidden (tuple): Schema fields that can not be selected.
+
+    Returns:
+        FieldSet: The fieldset, None when no fields were requested.
+    """
+    names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    if not names:
+        return None
+
+    columns = {
+        column.key: column
+        for column in schema_columns(model, schema)
+        if column.key not in hidden
+    }
+    unknown = [name for name in names if name not in columns and name not in relations]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unable to select fields '{', '.join(unknown)}'"
+        )
+
+    names = list(dict.fromkeys(["id"] + names))
+    return FieldSet(
+        names=names,
+        columns=[columns[name] for name in names if name in columns],
+        expanded={name: relations[name] for name in names if name in relations},
+    )
+
+
+def select_fields(model, fieldset: FieldSet, *extra):
+    """
+    Build a select of the fieldset, plus extra columns needed by the query
+    (e.g. the sort column of keyset pages)
+
+    Returns:
+        Select: The query, yielding row tuples rather than entities.
+    """
+    columns = fieldset.columns + [
+        column for column in extra if column.key not in fieldset.names
+    ]
+    return select_columns(model, columns, fieldset.expanded)
+
+
+def field_items(rows, fieldset: FieldSet) -> list:
+    """
+    Convert rows of select_fields into dicts of the requested fields only
+
+    Returns:
+        list: One dict per row.
+    """
+    return [
+        {name: item[name] for name in fieldset.names}
+        for item in to_items(rows, fieldset.expanded)
+    ]
+
@@ -0,0 +1,96 @@
+import json
+from datetime import date, datetime
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+# pre-built serializer per schema
+_serializers: dict = {}
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# the same settings as FastAPI's JSONResponse, built once
+_encoder = json.JSONEncoder(
+    default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+)
+
+
+def dumps(content) -> bytes:
+    return _encoder.encode(content).encode("utf-8")
+
+
+def json_response(content, response: Response = None) -> Response:
+    """
+    Serialize plain dicts straight to JSON, skipping the response model, and
+    keep the headers already set on the response
+
+    Returns:
+        Response: The JSON response.
+    """
+    out = Response(content=dumps(content), media_type="application/json")
+    if response is not None:
+        out.raw_headers.extend(response.raw_headers)
+    return out
+
+
+def _converter(field):
+    # nested schemas and float coercion, everything else passes through
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        nested = serializer(field.type_)
+        if field.shape == SHAPE_LIST:
+            return lambda value: None if value is None else [nested(v) for v in value]
+        if field.shape == SHAPE_SINGLETON:
+            return lambda value: None if value is None else nested(value)
+    # constrained floats, e.g. Field(..., ge=0), are float subclasses
+    if (
+        isinstance(field.type_, type)
+        and issubclass(field.type_, float)
+        and field.shape == SHAPE_SINGLETON
+    ):
+        return lambda value: None if value is None else float(value)
+    return None
+
+
+def _build(schema):
+    fields = [
+        (name, field.get_default(), _converter(field))
+        for name, field in schema.__fields__.items()
+    ]
+
+    def serialize(obj) -> dict:
+        item = {}
+        for name, default, convert in fields:
+            value = getattr(obj, name, default)
+            item[name] = value if convert is None else convert(value)
+        return item
+
+    return serialize
+
+
+def serializer(schema):
+    """
+    Get the pre-built serializer of an orm_mode schema. It reads the schema
+    fields off an ORM object into the dict the validated schema would dump,
+    without running the validators.
+
+    Args:
+        schema (BaseModel): The response schema.
+
+    Returns:
+        function: The serializer, ORM object to dict.
+    """
+    serialize = _serializers.get(schema)
+    if serialize is None:
+        serialize = _serializers[schema] = _build(schema)
+    return serialize
+
+
+def serialize_all(objects, schema) -> list:
+    serialize = serializer(schema)
+    return [serialize(obj) for obj in objects]
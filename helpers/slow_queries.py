@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from database import DATABASE_URL, engine_options
+from helpers import metrics
+from models.slow_query_model import SlowQueryDB
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+# bound on the re-run of an explained statement
+EXPLAIN_TIMEOUT_MS = 30000
+
+# unpooled engines for the EXPLAIN and the insert of its plan, by url, so
+# they never take connections from the request pools
+_engines: dict = {}
+
+# pending EXPLAIN tasks, at most one at a time
+_tasks: set = set()
+
+
+def parameter_shape(parameters, executemany: bool) -> dict:
+    """
+    Describe the parameters of a statement by their types, leaving out
+    their values
+
+    Returns:
+        dict: The rows bound and the parameter types of the first.
+    """
+    rows = list(parameters or ()) if executemany else [parameters]
+    first = rows[0] if rows else ()
+    if isinstance(first, dict):
+        types = {name: type(value).__name__ for name, value in first.items()}
+    else:
+        types = [type(value).__name__ for value in first or ()]
+    return {"rows": len(rows), "types": types}
+
+
+def explainable(statement: str, executemany: bool) -> bool:
+    # EXPLAIN ANALYZE runs the statement again, so only plain selects
+    return not executemany and statement.lstrip()[:6].upper() == "SELECT"
+
+
+def _engine(url):
+    side_engine = _engines.get(url)
+    if side_engine is None:
+        side_engine = _engines[url] = create_async_engine(
+            url, poolclass=NullPool, connect_args=engine_options()["connect_args"]
+        )
+    return side_engine
+
+
+async def _explain(url, statement: str, parameters, record: dict):
+    try:
+        async with _engine(url).connect() as conn:
+            await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+            result = await conn.exec_driver_sql(EXPLAIN_PREFIX + statement, parameters)
+            plan = result.scalar()
+            await conn.rollback()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        async with _engine(DATABASE_URL).begin() as conn:
+            await conn.execute(
+                insert(SlowQueryDB).values(
+                    route=record["route"],
+                    statement=statement,
+                    parameters=record["parameters"],
+                    duration_ms=record["duration_ms"],
+                    plan=plan,
+                )
+            )
+    except Exception:
+        logger.exception("Unable to explain the slow query: %s", statement)
+
+
+def _schedule_explain(url, statement: str, parameters, record: dict):
+    if _tasks:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    task = loop.create_task(_explain(url, statement, parameters, record))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_slow_query_start", None)
+    if start is None:
+        return
+
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < settings.slow_query_ms:
+        return
+
+    stats = metrics.request_stats()
+    record = {
+        "event": "slow_query",
+        "route": stats.route if stats is not None else None,
+        "duration_ms": round(duration_ms, 2),
+        "statement": statement,
+        "parameters": parameter_shape(parameters, executemany),
+    }
+    logger.warning(json.dumps(record))
+
+    if (
+        settings.slow_query_explain_sample > 0
+        and explainable(statement, executemany)
+        and random.random() < settings.slow_query_explain_sample
+    ):
+        _schedule_explain(conn.engine.url, statement, parameters, record)
+
+
+def instrument_engine(engine):
+    """
+    Log the statements of an engine slower than the slow_query_ms setting,
+    and explain a sample of the slow selects into the slow_queries table.
+    Nothing is attached when the threshold is 0.
+
+    Args:
+        engine (AsyncEngine): The engine to watch.
+    """
+    if settings.slow_query_ms <= 0:
+        return
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def shutdown():
+    """
+    Wait for a pending EXPLAIN and close its connections
+    """
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    for side_engine in _engines.values():
+        await side_engine.dispose()
+    _engines.clear()
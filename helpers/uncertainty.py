@@ -0,0 +1,252 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from fastapi import HTTPException
+
+from helpers import costing
+
+PERCENTILES = [5, 50, 95]
+
+# samples evaluated per batch inside a shard, bounds worker memory
+SAMPLE_CHUNK_SIZE = 256
+
+# jobs kept for polling; running jobs are never evicted, so this also bounds
+# the jobs running at once
+MAX_JOBS = 50
+
+_pool: ProcessPoolExecutor | None = None
+
+# per process: a job can only be polled on the worker that started it, so
+# the sensitivity endpoints need a single worker
+jobs: "OrderedDict[str, dict]" = OrderedDict()
+
+# strong references to the running job tasks
+_tasks: set = set()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, so workers never inherit the event loop or open DB connections
+        _pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _sample(rng: np.random.Generator, mean: np.ndarray, cv: float, size):
+    # normal around the estimate, truncated at zero
+    if cv <= 0:
+        return np.broadcast_to(mean, size).astype(float)
+    return np.maximum(rng.normal(mean, np.abs(mean) * cv, size=size), 0)
+
+
+def run_shard(
+    data: costing.CostingInput,
+    payers: np.ndarray,
+    lab_matrix: np.ndarray,
+    samples: int,
+    reagent_cost_cv: float,
+    expiry_period_cv: float,
+    volume_cv: float,
+    seed,
+):
+    """
+    Sample the cost inputs and cost every test for one shard of samples.
+    Runs in a worker process.
+
+    Returns:
+        tuple: The sampled costs per test (samples, N) and per lab (samples, L).
+    """
+    rng = np.random.default_rng(seed)
+    n_tests = data.test_ids.size
+
+    test_costs = np.empty((samples, n_tests), dtype=np.float32)
+    for start in range(0, samples, SAMPLE_CHUNK_SIZE):
+        size = min(SAMPLE_CHUNK_SIZE, samples - start)
+
+        reagent_cost = _sample(
+            rng, data.reagent_cost, reagent_cost_cv, (size, data.reagent_cost.size)
+        )
+        expiry_period = _sample(
+            rng,
+            data.reagent_expiry_period,
+            expiry_period_cv,
+            (size, data.reagent_expiry_period.size),
+        )
+
+        # shift the annual total by the sampled change of each payer volume
+        volumes = _sample(rng, payers, volume_cv, (size,) + payers.shape)
+        annual_total = np.maximum(
+            data.annual_total + (volumes - payers).sum(axis=-1), 0
+        )
+
+        costs = costing.compute_costs(
+            data,
+            annual_total=annual_total,
+            reagent_cost=reagent_cost,
+            reagent_expiry_period=expiry_period,
+        )
+        test_costs[start : start + size] = costs.total_cost
+
+    return test_costs, test_costs @ lab_matrix
+
+
+def _bands(samples: np.ndarray):
+    # P5/P50/P95 and mean per column
+    percentiles = np.percentile(samples, PERCENTILES, axis=0)
+    return np.vstack([percentiles, samples.mean(axis=0)]).T.tolist()
+
+
+def _band(id, name, values):
+    p5, p50, p95, mean = values
+    return {"id": id, "name": name, "p5": p5, "p50": p50, "p95": p95, "mean": mean}
+
+
+def _summarize(tests, lab_ids, lab_names, test_shards, lab_shards):
+    test_bands = _bands(np.concatenate(test_shards))
+    lab_bands = _bands(np.concatenate(lab_shards))
+
+    return {
+        "tests": [
+            _band(test.id, test.name, values)
+            for test, values in zip(tests, test_bands)
+        ],
+        "labs": [
+            _band(lab_id, lab_names.get(lab_id, ""), values)
+            for lab_id, values in zip(lab_ids, lab_bands)
+        ],
+    }
+
+
+def start_job(*args, **kwargs) -> str:
+    """
+    Register a job and run it in the background; the arguments are those of
+    run_job after the job id. Fails with a 503 when MAX_JOBS jobs are running.
+
+    Returns:
+        string: The job id to poll.
+    """
+    job_id = _create_job()
+    task = asyncio.create_task(run_job(job_id, *args, **kwargs))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job_id
+
+
+def _create_job() -> str:
+    # forget the oldest finished jobs to make room
+    finished = [job_id for job_id, job in jobs.items() if job["status"] != "running"]
+    while len(jobs) >= MAX_JOBS and finished:
+        del jobs[finished.pop(0)]
+
+    if len(jobs) >= MAX_JOBS:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Unable to start a sensitivity job, {len(jobs)} jobs are already running",
+        )
+
+    job_id = uuid.uuid4().hex
+    jobs[job_id] = {
+        "job_id": job_id,
+        "status": "running",
+        "progress": 0.0,
+        "result": None,
+        "error": None,
+    }
+    return job_id
+
+
+async def run_job(
+    job_id: str,
+    tests,
+    data: costing.CostingInput,
+    lab_names: dict,
+    samples: int,
+    reagent_cost_cv: float,
+    expiry_period_cv: float,
+    volume_cv: float,
+    seed=None,
+    shards=None,
+):
+    """
+    Shard the Monte Carlo samples across the process pool and record the
+    progress and the P5/P50/P95 bands on the job
+    """
+    job = jobs[job_id]
+    try:
+        # the row objects and item dicts are not needed by the workers
+        data = dataclasses.replace(
+            data, reagents=[], instruments=[], reagent_items=[], instrument_items=[]
+        )
+        payers = np.array(
+            [
+                [
+                    test.annual_credit,
+                    test.annual_nhima,
+                    test.annual_research,
+                    test.annual_walkins,
+                ]
+                for test in tests
+            ],
+            dtype=float,
+        ).reshape(len(tests), 4)
+
+        lab_ids = sorted({test.lab_id for test in tests})
+        lab_index = {lab_id: i for i, lab_id in enumerate(lab_ids)}
+        lab_matrix = np.zeros((len(tests), len(lab_ids)), dtype=np.float32)
+        lab_rows = [lab_index[test.lab_id] for test in tests]
+        lab_matrix[np.arange(len(tests)), lab_rows] = 1
+
+        shards = max(1, min(shards or (os.cpu_count() or 1) * 4, samples))
+        sizes = [len(part) for part in np.array_split(np.arange(samples), shards)]
+        seeds = np.random.SeedSequence(seed).spawn(shards)
+
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        futures = [
+            loop.run_in_executor(
+                pool,
+                run_shard,
+                data,
+                payers,
+                lab_matrix,
+                size,
+                reagent_cost_cv,
+                expiry_period_cv,
+                volume_cv,
+                shard_seed,
+            )
+            for size, shard_seed in zip(sizes, seeds)
+        ]
+
+        test_shards = []
+        lab_shards = []
+        for done, future in enumerate(asyncio.as_completed(futures), start=1):
+            test_costs, lab_costs = await future
+            test_shards.append(test_costs)
+            lab_shards.append(lab_costs)
+            job["progress"] = done / len(futures)
+
+        # percentiles over all samples, off the event loop
+        job["result"] = await asyncio.to_thread(
+            _summarize, tests, lab_ids, lab_names, test_shards, lab_shards
+        )
+        job["status"] = "completed"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
-from database import engine, Base
+import migrations
+from database import engine, read_engine
 from routes import auth_routes
 from routes import user_routes
 from routes import lab_routes
@@ -7,19 +8,38 @@ from routes import test_routes
 from routes import instrument_routes
 from routes import reagent_routes
 from routes import dashboard_routes
+from routes import costing_routes
+from routes import test_reagent_routes
+from routes import test_instrument_routes
+from routes import sync_routes
+from routes import metrics_routes
+from routes import slow_query_routes
 
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from helpers.http_client import init_client, close_client
+from helpers import assist, metrics, profiler, slow_queries, uncertainty
+from settings import describe, settings
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup logic
-    print("Application starting up new...")
+    # Startup logic, no DDL: the schema is owned by the migrations
+    print("Effective settings:")
+    for name, value in describe().items():
+        print(f"  {name} = {value}")
+
+    if settings.db_migrate_on_startup:
+        for migration in await migrations.upgrade(engine):
+            print(f"Applied migration {migration.version} {migration.name}")
+
+    await init_client()
     yield
     # Shutdown logic
-    print("Application shutting down new...")
+    await close_client()
+    uncertainty.shutdown_pool()
+    assist.shutdown_hash_pool()
+    await slow_queries.shutdown()
 
 origins = [
         "http://localhost",
@@ -28,7 +48,7 @@ origins = [
     ]
 
 
-app = FastAPI(title="CCL Test Costing [FastAPI/PostgreSQL]")
+app = FastAPI(title="CCL Test Costing [FastAPI/PostgreSQL]", lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="uploads"), name="static")
 
@@ -39,8 +59,21 @@ app.add_middleware(
         allow_credentials=True,
         allow_methods=["*"],  # Allows all HTTP methods
         allow_headers=["*"],  # Allows all headers
+        expose_headers=["X-Next-Cursor", "ETag"],  # Readable by the clients
     )
 
+# request metrics, labelled by route template
+app.add_middleware(metrics.MetricsMiddleware, router=app.router)
+
+# slow query log
+slow_queries.instrument_engine(engine)
+if read_engine is not engine:
+    slow_queries.instrument_engine(read_engine)
+
+# opt-in single request profiles
+if settings.profiler_enabled:
+    app.add_middleware(profiler.ProfilerMiddleware, router=app.router)
+
 # include routers
 app.include_router(user_routes.router)
 app.include_router(auth_routes.router)
@@ -49,19 +82,12 @@ app.include_router(test_routes.router)
 app.include_router(instrument_routes.router)
 app.include_router(reagent_routes.router)
 app.include_router(dashboard_routes.router)
-# create tables at startup
-
+app.include_router(costing_routes.router)
+app.include_router(test_reagent_routes.router)
+app.include_router(test_instrument_routes.router)
+app.include_router(sync_routes.router)
+app.include_router(metrics_routes.router)
+app.include_router(slow_query_routes.router)
 
-@app.on_event("startup")
-async def startup():
-    await init_client()
-    async with engine.begin() as conn:
-        print("Application starting up old...")
-        await conn.run_sync(Base.metadata.create_all)
-        
-@app.on_event("shutdown")
-async def shutdown_event():
-    await close_client()
-    
 def get_httpsx_client():
     return app.state.client
\ No newline at end of file
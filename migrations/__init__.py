@@ -0,0 +1,132 @@
+import importlib
+import pkgutil
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+# table recording the applied versions
+VERSION_TABLE = "schema_migrations"
+
+# advisory lock key, so only one process migrates at a time
+LOCK_KEY = 7_420_021
+
+VERSIONS_PACKAGE = f"{__name__}.versions"
+
+
+@dataclass
+class Migration:
+    # zero padded version and name, from the NNNN_name module file name
+    version: str
+    name: str
+
+    # DDL run in order, in one transaction
+    statements: list
+
+
+def discover() -> list:
+    """
+    Load the migrations of the versions package
+
+    Returns:
+        list: The migrations, oldest first.
+    """
+    package = importlib.import_module(VERSIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        version, _, name = info.name.partition("_")
+        if not version.isdigit():
+            continue
+        module = importlib.import_module(f"{VERSIONS_PACKAGE}.{info.name}")
+        migrations.append(Migration(version, name, list(module.STATEMENTS)))
+
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {VERSIONS_PACKAGE}")
+    return migrations
+
+
+async def _ensure_version_table(conn):
+    await conn.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+                version VARCHAR PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+            )
+            """
+        )
+    )
+
+
+async def applied_versions(conn) -> set:
+    result = await conn.execute(
+        text("SELECT to_regclass(:table) IS NOT NULL"), {"table": VERSION_TABLE}
+    )
+    if not result.scalar():
+        return set()
+
+    result = await conn.execute(text(f"SELECT version FROM {VERSION_TABLE}"))
+    return set(result.scalars().all())
+
+
+async def status(engine) -> list:
+    """
+    Get the migrations and whether each was applied
+
+    Returns:
+        list: (migration, applied) pairs, oldest first.
+    """
+    async with engine.connect() as conn:
+        applied = await applied_versions(conn)
+    return [(migration, migration.version in applied) for migration in discover()]
+
+
+async def upgrade(engine) -> list:
+    """
+    Apply the pending migrations, each in its own transaction. Concurrent
+    callers wait on an advisory lock, so it is safe to run from every
+    deployment step or worker.
+
+    Args:
+        engine (AsyncEngine): The primary database engine.
+
+    Returns:
+        list: The applied migrations.
+    """
+    migrations = discover()
+    applied = []
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        await conn.commit()
+        try:
+            await _ensure_version_table(conn)
+            await conn.commit()
+
+            done = await applied_versions(conn)
+            await conn.commit()
+
+            for migration in migrations:
+                if migration.version in done:
+                    continue
+
+                for statement in migration.statements:
+                    await conn.execute(text(statement))
+                await conn.execute(
+                    text(
+                        f"INSERT INTO {VERSION_TABLE} (version, name) VALUES (:version, :name)"
+                    ),
+                    {"version": migration.version, "name": migration.name},
+                )
+                await conn.commit()
+                applied.append(migration)
+        finally:
+            await conn.rollback()
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY}
+            )
+            await conn.commit()
+
+    return applied
@@ -0,0 +1,45 @@
+"""
+Apply or list the schema migrations of the configured database.
+
+    python -m migrations upgrade
+    python -m migrations status
+
+backfill-costs links and costs the tests written before the link tables and
+cost snapshots were kept in step on write; run it once after upgrading.
+
+    python -m migrations backfill-costs
+"""
+
+import argparse
+import asyncio
+
+import migrations
+from database import AsyncSessionLocal, engine
+from helpers import cost_snapshot
+
+
+async def run(command: str):
+    try:
+        if command == "upgrade":
+            applied = await migrations.upgrade(engine)
+            for migration in applied:
+                print(f"applied {migration.version} {migration.name}")
+            if not applied:
+                print("database is up to date")
+        elif command == "backfill-costs":
+            async with AsyncSessionLocal() as db:
+                refreshed = await cost_snapshot.refresh_missing_test_costs(db)
+                await db.commit()
+            print(f"costed {refreshed} tests")
+        else:
+            for migration, applied in await migrations.status(engine):
+                state = "applied" if applied else "pending"
+                print(f"{migration.version} {migration.name:<24} {state}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=("upgrade", "status", "backfill-costs"))
+    asyncio.run(run(parser.parse_args().command))
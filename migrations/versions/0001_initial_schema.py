@@ -0,0 +1,191 @@
+"""
+Initial schema, the tables and indexes create_all used to make at startup.
+
+Everything is IF NOT EXISTS, so databases created by create_all are adopted
+as they are.
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL NOT NULL,
+        code VARCHAR,
+        type INTEGER,
+        fname VARCHAR NOT NULL,
+        lname VARCHAR NOT NULL,
+        position VARCHAR,
+        email VARCHAR NOT NULL,
+        mobile_code VARCHAR NOT NULL,
+        mobile VARCHAR NOT NULL,
+        address_physical VARCHAR,
+        address_postal VARCHAR,
+        role INTEGER NOT NULL,
+        password VARCHAR NOT NULL,
+        status_id INTEGER NOT NULL,
+        stage_id INTEGER NOT NULL,
+        approval_levels INTEGER NOT NULL,
+        review1_at TIMESTAMP WITH TIME ZONE,
+        review1_by VARCHAR,
+        review1_comments VARCHAR,
+        review2_at TIMESTAMP WITH TIME ZONE,
+        review2_by VARCHAR,
+        review2_comments VARCHAR,
+        review3_at TIMESTAMP WITH TIME ZONE,
+        review3_by VARCHAR,
+        review3_comments VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS instruments (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        description VARCHAR,
+        cost FLOAT NOT NULL,
+        amortization FLOAT NOT NULL,
+        annual_cost FLOAT NOT NULL,
+        maintenance_cost FLOAT NOT NULL,
+        total_cost FLOAT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS labs (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        description VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS reagents (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        description VARCHAR,
+        cost FLOAT NOT NULL,
+        expiry_period FLOAT NOT NULL,
+        generic_reagent_unit VARCHAR NOT NULL,
+        quantity_per_gru FLOAT NOT NULL,
+        tests_per_gru FLOAT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tests (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        lab_id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        description VARCHAR,
+        reagent_list JSONB NOT NULL,
+        instrument_list JSONB NOT NULL,
+        annual_credit INTEGER NOT NULL,
+        annual_nhima INTEGER NOT NULL,
+        annual_research INTEGER NOT NULL,
+        annual_walkins INTEGER NOT NULL,
+        annual_shift FLOAT NOT NULL,
+        annual_total INTEGER NOT NULL,
+        sites_no INTEGER NOT NULL,
+        staff_no INTEGER NOT NULL,
+        runs_day_week INTEGER NOT NULL,
+        runs_shift_day INTEGER NOT NULL,
+        runs_annual INTEGER NOT NULL,
+        runs_average_volume FLOAT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id),
+        FOREIGN KEY(lab_id) REFERENCES labs (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS test_costs (
+        id SERIAL NOT NULL,
+        test_id INTEGER NOT NULL,
+        lab_id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        annual_total INTEGER NOT NULL,
+        reagent_cost FLOAT NOT NULL,
+        instrument_cost FLOAT NOT NULL,
+        total_cost FLOAT NOT NULL,
+        reagent_items JSONB NOT NULL,
+        instrument_items JSONB NOT NULL,
+        computed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(test_id) REFERENCES tests (id),
+        FOREIGN KEY(lab_id) REFERENCES labs (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS test_instrument (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        test_id INTEGER NOT NULL,
+        instrument_id INTEGER NOT NULL,
+        annual_volume INTEGER NOT NULL,
+        percent_volume FLOAT NOT NULL,
+        annual_cost FLOAT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id),
+        FOREIGN KEY(test_id) REFERENCES tests (id),
+        FOREIGN KEY(instrument_id) REFERENCES instruments (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS test_reagents (
+        id SERIAL NOT NULL,
+        user_id INTEGER NOT NULL,
+        test_id INTEGER NOT NULL,
+        reagent_id INTEGER NOT NULL,
+        test_no INTEGER NOT NULL,
+        actual_test_no FLOAT NOT NULL,
+        actual_test_cost FLOAT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_by VARCHAR,
+        updated_at TIMESTAMP WITH TIME ZONE,
+        updated_by VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id),
+        FOREIGN KEY(test_id) REFERENCES tests (id),
+        FOREIGN KEY(reagent_id) REFERENCES reagents (id)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+    "CREATE INDEX IF NOT EXISTS ix_instruments_id ON instruments (id)",
+    "CREATE INDEX IF NOT EXISTS ix_labs_id ON labs (id)",
+    "CREATE INDEX IF NOT EXISTS ix_reagents_id ON reagents (id)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_id ON tests (id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_costs_id ON test_costs (id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_test_costs_test_id ON test_costs (test_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_instrument_id ON test_instrument (id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_reagents_id ON test_reagents (id)",
+]
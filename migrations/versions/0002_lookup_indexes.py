@@ -0,0 +1,40 @@
+"""
+Foreign key, timestamp and lookup indexes.
+
+create_all never adds indexes to tables that already exist, so databases
+created before these were declared on the models are missing them.
+"""
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_users_created_at ON users (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_pattern ON users (email text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_updated_at ON users (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_instruments_created_at ON instruments (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_instruments_name_id ON instruments (name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_instruments_name_pattern ON instruments (name text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_instruments_updated_at ON instruments (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_instruments_user_id ON instruments (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_labs_created_at ON labs (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_labs_name_id ON labs (name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_labs_name_pattern ON labs (name text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_labs_updated_at ON labs (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_labs_user_id ON labs (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_reagents_created_at ON reagents (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_reagents_name_id ON reagents (name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_reagents_name_pattern ON reagents (name text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_reagents_updated_at ON reagents (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_reagents_user_id ON reagents (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_created_at ON tests (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_lab_id ON tests (lab_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_name_id ON tests (name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_name_pattern ON tests (name text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_updated_at ON tests (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_user_id ON tests (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_costs_lab_id ON test_costs (lab_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_instrument_instrument_id ON test_instrument (instrument_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_instrument_test_id ON test_instrument (test_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_instrument_user_id ON test_instrument (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_reagents_reagent_id ON test_reagents (reagent_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_reagents_test_id ON test_reagents (test_id)",
+    "CREATE INDEX IF NOT EXISTS ix_test_reagents_user_id ON test_reagents (user_id)",
+]
@@ -0,0 +1,20 @@
+"""
+Explained slow queries, written by helpers/slow_queries.py.
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS slow_queries (
+        id SERIAL NOT NULL,
+        route VARCHAR,
+        statement VARCHAR NOT NULL,
+        parameters JSONB NOT NULL,
+        duration_ms FLOAT NOT NULL,
+        plan JSONB NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_slow_queries_id ON slow_queries (id)",
+    "CREATE INDEX IF NOT EXISTS ix_slow_queries_created_at ON slow_queries (created_at)",
+]
@@ -0,0 +1,13 @@
+"""
+Keyset pagination indexes for the created_at sort.
+
+The lists sort by coalesce(created_at, '-infinity'), id so rows without a
+timestamp keep a position in the keyset; the single column created_at
+indexes do not cover that key.
+"""
+
+STATEMENTS = [
+    f"CREATE INDEX IF NOT EXISTS ix_{table}_created_at_id "
+    f"ON {table} ((coalesce(created_at, '-infinity'::timestamptz)), id)"
+    for table in ("instruments", "labs", "reagents", "tests", "users")
+]
@@ -0,0 +1,19 @@
+"""
+Transaction stamps for the delta sync.
+
+Rows record the transaction that last wrote them. /sync resumes from the
+oldest transaction still running when the previous sync read, so it no
+longer depends on write timestamps and commit delays.
+"""
+
+TABLES = ("instruments", "labs", "reagents", "tests", "users")
+
+STATEMENTS = [
+    statement
+    for table in TABLES
+    for statement in (
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS changed_txid BIGINT "
+        "NOT NULL DEFAULT txid_current()",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_changed_txid ON {table} (changed_txid)",
+    )
+]
@@ -0,0 +1,14 @@
+"""
+GIN indexes on the test reagent/instrument lists.
+
+Creating a reagent or instrument links the tests whose lists already
+reference it with a @> containment lookup, which would otherwise scan every
+test.
+"""
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_tests_reagent_list "
+    "ON tests USING gin (reagent_list jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_tests_instrument_list "
+    "ON tests USING gin (instrument_list jsonb_path_ops)",
+]
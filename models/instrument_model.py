@@ -1,22 +1,38 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float, Index, BigInteger, func, text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from database import Base
 from datetime import datetime
 
-from models.user_model import User
+from models.user_model import User, UserSimple
 
 
 # ---------- SQLAlchemy Models ----------
 class InstrumentDB(Base):
     __tablename__ = "instruments"
+    __table_args__ = (
+        # keyset pagination sorted by created_at, NULL sorting first
+        Index(
+            "ix_instruments_created_at_id",
+            text("coalesce(created_at, '-infinity'::timestamptz)"),
+            "id",
+        ),
+        # keyset pagination sorted by name
+        Index("ix_instruments_name_id", "name", "id"),
+        # name prefix filter
+        Index(
+            "ix_instruments_name_pattern",
+            "name",
+            postgresql_ops={"name": "text_pattern_ops"},
+        ),
+    )
 
     # id
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
     # user
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     # details
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
@@ -28,14 +44,27 @@ class InstrumentDB(Base):
     maintenance_cost = Column(Float, nullable=False)
     total_cost = Column(Float, nullable=False)
     # service columns
-    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=datetime.now, nullable=True, index=True
+    )
     created_by = Column(String, nullable=True, default="System")
-    updated_at = Column(DateTime(timezone=True), onupdate=datetime.now, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True), onupdate=datetime.now, nullable=True, index=True
+    )
     updated_by = Column(String, nullable=True)
 
+    # transaction that last wrote the row, the /sync position
+    changed_txid = Column(
+        BigInteger,
+        server_default=text("txid_current()"),
+        onupdate=func.txid_current(),
+        nullable=False,
+        index=True,
+    )
+
     # relationships
     user = relationship("UserDB", back_populates="instruments", lazy="selectin")
-    #test_instrument = relationship("TestInstrumentDB", back_populates="instrument", lazy="selectin")
+    test_instrument = relationship("TestInstrumentDB", back_populates="instrument")
 # ---------- Pydantic Schemas ----------
 class Instrument(BaseModel):
     # id
@@ -65,4 +94,25 @@ class Instrument(BaseModel):
         orm_mode = True
 
 class InstrumentWithDetail(Instrument):
-    user: User
\ No newline at end of file
+    user: User
+
+
+# compact list row, relationships are expanded on request
+class InstrumentItem(BaseModel):
+    # id
+    id: int
+    # user
+    user_id: int
+
+    name: str
+    total_cost: float
+
+    # service columns
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    # expanded relationships
+    user: Optional[UserSimple] = None
+
+    class Config:
+        orm_mode = True
@@ -1,35 +1,64 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Index, BigInteger, func, text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from database import Base
 from datetime import datetime
 
-from models.user_model import User
+from models.user_model import User, UserSimple
 
 
 # ---------- SQLAlchemy Models ----------
 class LabDB(Base):
     __tablename__ = "labs"
+    __table_args__ = (
+        # keyset pagination sorted by created_at, NULL sorting first
+        Index(
+            "ix_labs_created_at_id",
+            text("coalesce(created_at, '-infinity'::timestamptz)"),
+            "id",
+        ),
+        # keyset pagination sorted by name
+        Index("ix_labs_name_id", "name", "id"),
+        # name prefix filter
+        Index(
+            "ix_labs_name_pattern",
+            "name",
+            postgresql_ops={"name": "text_pattern_ops"},
+        ),
+    )
 
     # id
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
     # user
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
 
     # service columns
-    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=datetime.now, nullable=True, index=True
+    )
     created_by = Column(String, nullable=True, default="System")
-    updated_at = Column(DateTime(timezone=True), onupdate=datetime.now, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True), onupdate=datetime.now, nullable=True, index=True
+    )
     updated_by = Column(String, nullable=True)
 
+    # transaction that last wrote the row, the /sync position
+    changed_txid = Column(
+        BigInteger,
+        server_default=text("txid_current()"),
+        onupdate=func.txid_current(),
+        nullable=False,
+        index=True,
+    )
+
     # relationships
     user = relationship("UserDB", back_populates="labs", lazy="selectin")
-    tests = relationship("TestDB", back_populates="lab", lazy="selectin")
+    tests = relationship("TestDB", back_populates="lab")
 # ---------- Pydantic Schemas ----------
 class Lab(BaseModel):
     # id
@@ -54,4 +83,30 @@ class Lab(BaseModel):
         orm_mode = True
 
 class LabWithDetail(Lab):
-    user: User
\ No newline at end of file
+    user: User
+
+
+# lab reference embedded in other lists
+class LabSimple(BaseModel):
+    # id
+    id: int
+
+    name: str
+
+    class Config:
+        orm_mode = True
+
+
+# compact list row, relationships are expanded on request
+class LabItem(LabSimple):
+    # user
+    user_id: int
+
+    description: Optional[str] = None
+
+    # service columns
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    # expanded relationships
+    user: Optional[UserSimple] = None
@@ -1,11 +1,12 @@
 
-from typing import Any, List, Optional
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
 
 from models.instrument_model import Instrument
 from models.lab_model import Lab
 from models.reagent_model import Reagent
-from models.test_model import TestWithDetail
+from models.test_model import Test, TestWithDetail
+from models.user_model import UserSimple
 
 class ParamTestDetail(BaseModel):
     labs: List[Lab]
@@ -43,3 +44,108 @@ class ParamDashboard(BaseModel):
     
     class Config:
         orm_mode = True
+
+
+class ParamScenario(BaseModel):
+    name: str
+    # cost overrides
+    reagent_cost_factor: float = Field(1, ge=0, description="Multiplier applied to every reagent cost")
+    instrument_cost_factor: float = Field(1, ge=0, description="Multiplier applied to every instrument cost")
+    reagent_costs: Dict[int, float] = Field({}, description="Absolute cost per reagent id, applied after the factor")
+    instrument_costs: Dict[int, float] = Field({}, description="Absolute cost per instrument id, applied after the factor")
+    # annual volume overrides
+    annual_credit_factor: float = Field(1, ge=0)
+    annual_nhima_factor: float = Field(1, ge=0)
+    annual_research_factor: float = Field(1, ge=0)
+    annual_walkins_factor: float = Field(1, ge=0)
+
+
+class ParamScenarioRequest(BaseModel):
+    scenarios: List[ParamScenario] = Field(..., min_items=1, max_items=10000)
+
+
+class ParamScenarioResult(BaseModel):
+    name: str
+    reagent_cost: float
+    instrument_cost: float
+    total_cost: float
+    change: float
+
+
+class ParamScenarioResponse(BaseModel):
+    total_tests: int
+    baseline_cost: float
+    scenarios: List[ParamScenarioResult] = []
+
+
+class ParamSensitivityRequest(BaseModel):
+    samples: int = Field(2000, ge=100, le=20000, description="Number of Monte Carlo samples")
+    reagent_cost_cv: float = Field(0.1, ge=0, le=2, description="Coefficient of variation of reagent costs")
+    expiry_period_cv: float = Field(0.1, ge=0, le=2, description="Coefficient of variation of reagent expiry periods")
+    volume_cv: float = Field(0.1, ge=0, le=2, description="Coefficient of variation of the annual payer volumes")
+    seed: Optional[int] = None
+    shards: Optional[int] = Field(None, ge=1, le=1024)
+
+
+class ParamCostBand(BaseModel):
+    id: int
+    name: str
+    p5: float
+    p50: float
+    p95: float
+    mean: float
+
+
+class ParamSensitivityResult(BaseModel):
+    tests: List[ParamCostBand] = []
+    labs: List[ParamCostBand] = []
+
+
+class ParamSensitivityJob(BaseModel):
+    job_id: str
+    status: str
+    progress: float
+    result: Optional[ParamSensitivityResult] = None
+    error: Optional[str] = None
+
+
+class ParamRollupRow(BaseModel):
+    id: Optional[int] = None
+    name: str
+    tests: int
+    # annual volumes
+    annual_credit: int
+    annual_nhima: int
+    annual_research: int
+    annual_walkins: int
+    annual_total: int
+    # costs
+    reagent_cost: float
+    instrument_cost: float
+    total_cost: float
+    # costs allocated by payer volume
+    credit_cost: float
+    nhima_cost: float
+    research_cost: float
+    walkins_cost: float
+
+
+class ParamPayerRollup(BaseModel):
+    payer: str
+    annual_volume: int
+    cost: float
+
+
+class ParamRollups(BaseModel):
+    labs: List[ParamRollupRow] = []
+    tests: List[ParamRollupRow] = []
+    payers: List[ParamPayerRollup] = []
+
+
+class ParamSync(BaseModel):
+    cursor: str
+    labs: List[Lab] = []
+    tests: List[Test] = []
+    reagents: List[Reagent] = []
+    instruments: List[Instrument] = []
+    users: List[UserSimple] = []
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from pydantic import BaseModel
+from typing import Any, Optional
+from database import Base
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# ---------- SQLAlchemy Models ----------
+class SlowQueryDB(Base):
+    __tablename__ = "slow_queries"
+
+    # id
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # originating request, e.g. GET /tests/list
+    route = Column(String, nullable=True)
+
+    # query, with the types of its parameters rather than their values
+    statement = Column(String, nullable=False)
+    parameters = Column(JSONB, nullable=False)
+    duration_ms = Column(Float, nullable=False)
+
+    # EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output
+    plan = Column(JSONB, nullable=False)
+
+    # service columns
+    created_at = Column(
+        DateTime(timezone=True), default=datetime.now, nullable=False, index=True
+    )
+
+
+# ---------- Pydantic Schemas ----------
+class SlowQuery(BaseModel):
+    # id
+    id: Optional[int] = None
+
+    # originating request
+    route: Optional[str] = None
+
+    # query
+    statement: str
+    parameters: dict[str, Any]
+    duration_ms: float
+
+    # plan
+    plan: list[dict[str, Any]]
+
+    # service columns
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
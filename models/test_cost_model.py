@@ -0,0 +1,69 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float
+from pydantic import BaseModel, Field
+from typing import Any, Optional
+from database import Base
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# ---------- SQLAlchemy Models ----------
+class TestCostDB(Base):
+    __tablename__ = "test_costs"
+
+    # id
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # test
+    test_id = Column(
+        Integer, ForeignKey("tests.id"), nullable=False, unique=True, index=True
+    )
+
+    # lab
+    lab_id = Column(Integer, ForeignKey("labs.id"), nullable=False, index=True)
+
+    # details
+    name = Column(String, nullable=False)
+    annual_total = Column(Integer, nullable=False)
+
+    # costs
+    reagent_cost = Column(Float, nullable=False)
+    instrument_cost = Column(Float, nullable=False)
+    total_cost = Column(Float, nullable=False)
+
+    # costed component items
+    reagent_items = Column(JSONB, nullable=False)
+    instrument_items = Column(JSONB, nullable=False)
+
+    # service columns
+    computed_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+
+
+# ---------- Pydantic Schemas ----------
+class TestCost(BaseModel):
+    # id
+    id: Optional[int] = None
+
+    # test
+    test_id: int
+
+    # lab
+    lab_id: int
+
+    # details
+    name: str
+    annual_total: int
+
+    # costs
+    reagent_cost: float = Field(..., ge=0)
+    instrument_cost: float = Field(..., ge=0)
+    total_cost: float = Field(..., ge=0)
+
+    # costed component items
+    reagent_items: list[dict[str, Any]] = []
+    instrument_items: list[dict[str, Any]] = []
+
+    # service columns
+    computed_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
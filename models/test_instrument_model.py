@@ -18,13 +18,15 @@ class TestInstrumentDB(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
     # user
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     # test
-    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
+    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
     
     # instrument
-    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
+    instrument_id = Column(
+        Integer, ForeignKey("instruments.id"), nullable=False, index=True
+    )
     
     # annual volumnes
     annual_volume = Column(Integer, nullable=False)
@@ -39,9 +41,9 @@ class TestInstrumentDB(Base):
     updated_by = Column(String, nullable=True)
 
     # relationships
-    #user = relationship("UserDB", back_populates="test_instrument", lazy="selectin")
-    #test = relationship("TestDB", back_populates="test_instrument", lazy="selectin")
-    #instrument = relationship("InstrumentDB", back_populates="test_instrument", lazy="selectin")
+    user = relationship("UserDB", back_populates="test_instrument", lazy="selectin")
+    test = relationship("TestDB", back_populates="test_instrument", lazy="selectin")
+    instrument = relationship("InstrumentDB", back_populates="test_instrument", lazy="selectin")
 # ---------- Pydantic Schemas ----------
 class TestInstrument(BaseModel):
     # id
@@ -72,28 +74,7 @@ class TestInstrument(BaseModel):
         ge=0,
         description="Annual cost must be greater or equal to zero",
     )
-    
-    # instrument usage
-    runs_day_week: int = Field(
-        ...,
-        ge=0,
-        description="Runs per day per week must be greater or equal to zero",
-    )
-    runs_shift_day: int = Field(
-        ...,
-        ge=0,
-        description="Runs per shift per day must be greater or equal to zero",
-    )
-    runs_annual: int = Field(
-        ...,
-        ge=0,
-        description="Annual runs must be greater or equal to zero",
-    )
-    runs_average_volume: float = Field(
-        ...,
-        ge=0,
-        description="Average volume per run must be greater or equal to zero",
-    )
+
     # service columns
     created_at: Optional[datetime] = None
     created_by: Optional[str]
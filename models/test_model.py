@@ -1,26 +1,55 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float, Index, BigInteger, func, text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, ConfigDict, Field
 from typing import Any, Optional
 from database import Base
 from datetime import datetime
 
-from models.lab_model import Lab
-from models.user_model import User
+from models.lab_model import Lab, LabSimple
+from models.user_model import User, UserSimple
 from sqlalchemy.dialects.postgresql import JSONB
 
 # ---------- SQLAlchemy Models ----------
 class TestDB(Base):
     __tablename__ = "tests"
+    __table_args__ = (
+        # keyset pagination sorted by created_at, NULL sorting first
+        Index(
+            "ix_tests_created_at_id",
+            text("coalesce(created_at, '-infinity'::timestamptz)"),
+            "id",
+        ),
+        # keyset pagination sorted by name
+        Index("ix_tests_name_id", "name", "id"),
+        # name prefix filter
+        Index(
+            "ix_tests_name_pattern",
+            "name",
+            postgresql_ops={"name": "text_pattern_ops"},
+        ),
+        # tests listing a newly created reagent/instrument (@> containment)
+        Index(
+            "ix_tests_reagent_list",
+            "reagent_list",
+            postgresql_using="gin",
+            postgresql_ops={"reagent_list": "jsonb_path_ops"},
+        ),
+        Index(
+            "ix_tests_instrument_list",
+            "instrument_list",
+            postgresql_using="gin",
+            postgresql_ops={"instrument_list": "jsonb_path_ops"},
+        ),
+    )
 
     # id
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
     # user
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # lab
-    lab_id = Column(Integer, ForeignKey("labs.id"), nullable=False)
+    lab_id = Column(Integer, ForeignKey("labs.id"), nullable=False, index=True)
     
     # details
     name = Column(String, nullable=False)
@@ -50,16 +79,30 @@ class TestDB(Base):
     runs_average_volume = Column(Float, nullable=False)
     
     # service columns
-    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=datetime.now, nullable=True, index=True
+    )
     created_by = Column(String, nullable=True, default="System")
-    updated_at = Column(DateTime(timezone=True), onupdate=datetime.now, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True), onupdate=datetime.now, nullable=True, index=True
+    )
     updated_by = Column(String, nullable=True)
 
+    # transaction that last wrote the row, the /sync position
+    changed_txid = Column(
+        BigInteger,
+        server_default=text("txid_current()"),
+        onupdate=func.txid_current(),
+        nullable=False,
+        index=True,
+    )
+
     # relationships
     user = relationship("UserDB", back_populates="tests", lazy="selectin")
     lab = relationship("LabDB", back_populates="tests", lazy="selectin")
-    #test_instrument = relationship("TestInstrumentDB", back_populates="test", lazy="selectin")
-    #test_reagent = relationship("TestReagentDB", back_populates="test", lazy="selectin")
+    test_instrument = relationship("TestInstrumentDB", back_populates="test")
+    test_reagent = relationship("TestReagentDB", back_populates="test")
+
 # ---------- Pydantic Schemas ----------
 class Test(BaseModel):
     # id
@@ -164,3 +207,30 @@ class Test(BaseModel):
 class TestWithDetail(Test):
     user: User
     lab: Lab
+
+
+# compact list row, relationships are expanded on request
+class TestItem(BaseModel):
+    # id
+    id: int
+
+    # user
+    user_id: int
+
+    # lab
+    lab_id: int
+
+    # details
+    name: str
+    annual_total: int
+
+    # service columns
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    # expanded relationships
+    user: Optional[UserSimple] = None
+    lab: Optional[LabSimple] = None
+
+    class Config:
+        orm_mode = True
@@ -18,13 +18,13 @@ class TestReagentDB(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
     # user
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     # test
-    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
+    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
     
     # reagent
-    reagent_id = Column(Integer, ForeignKey("reagents.id"), nullable=False)
+    reagent_id = Column(Integer, ForeignKey("reagents.id"), nullable=False, index=True)
     
     # annual
     test_no = Column(Integer, nullable=False)
@@ -39,9 +39,9 @@ class TestReagentDB(Base):
     updated_by = Column(String, nullable=True)
 
     # relationships
-    #user = relationship("UserDB", back_populates="test_reagent", lazy="selectin")
-    #test = relationship("TestDB", back_populates="test_reagent", lazy="selectin")
-    #reagent = relationship("ReagentDB", back_populates="test_reagent", lazy="selectin")
+    user = relationship("UserDB", back_populates="test_reagent", lazy="selectin")
+    test = relationship("TestDB", back_populates="test_reagent", lazy="selectin")
+    reagent = relationship("ReagentDB", back_populates="test_reagent", lazy="selectin")
 # ---------- Pydantic Schemas ----------
 class TestReagent(BaseModel):
     # id
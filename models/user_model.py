@@ -1,5 +1,5 @@
 from modulefinder import test
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, BigInteger, func, text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional, List
@@ -10,6 +10,20 @@ from database import Base
 # ---------- SQLAlchemy Models ----------
 class UserDB(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # keyset pagination sorted by created_at, NULL sorting first
+        Index(
+            "ix_users_created_at_id",
+            text("coalesce(created_at, '-infinity'::timestamptz)"),
+            "id",
+        ),
+        # email prefix filter
+        Index(
+            "ix_users_email_pattern",
+            "email",
+            postgresql_ops={"email": "text_pattern_ops"},
+        ),
+    )
 
     # id
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -51,18 +65,31 @@ class UserDB(Base):
     review3_comments = Column(String, nullable=True)
 
     # service columns
-    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=datetime.now, nullable=True, index=True
+    )
     created_by = Column(String, nullable=True)
-    updated_at = Column(DateTime(timezone=True), onupdate=datetime.now, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True), onupdate=datetime.now, nullable=True, index=True
+    )
     updated_by = Column(String, nullable=True)
 
+    # transaction that last wrote the row, the /sync position
+    changed_txid = Column(
+        BigInteger,
+        server_default=text("txid_current()"),
+        onupdate=func.txid_current(),
+        nullable=False,
+        index=True,
+    )
+
     # relationships
     labs = relationship("LabDB", back_populates="user")
     tests = relationship("TestDB", back_populates="user")
     instruments = relationship("InstrumentDB", back_populates="user")
     reagents = relationship("ReagentDB", back_populates="user")
-    #test_instrument = relationship("TestInstrumentDB", back_populates="user")
-    #test_reagent = relationship("TestReagentDB", back_populates="user")
+    test_instrument = relationship("TestInstrumentDB", back_populates="user")
+    test_reagent = relationship("TestReagentDB", back_populates="user")
 # ---------- Pydantic Schemas ----------
 class User(BaseModel):
     # id
@@ -6,8 +6,9 @@ from sqlalchemy.future import select
 from typing import List
 from jose import JWTError, jwt
 from database import get_db
-from models.user_model import User, UserDB
+from models.user_model import User, UserDB, UserSimple
 import helpers.assist as assist
+from helpers.auth import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -24,8 +25,11 @@ async def login(
         raise HTTPException(
             status_code=401, detail=f"The specified username or password is incorrect"
         )
-            
-    if not assist.verify_password(form_data.password, user.password):
+
+    # return the connection to the pool while hashing
+    await db.close()
+
+    if not await assist.verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=401, detail=f"The specified username or password is incorrect"
         )
@@ -41,3 +45,8 @@ async def login(
     token = jwt.encode(to_encode, assist.SECRET_KEY, algorithm=assist.ALGORITHM)
 
     return {"access_token": token, "token_type": "bearer"}
+
+
+@router.get("/me", response_model=UserSimple)
+async def me(user: User = Depends(get_current_user)):
+    return user
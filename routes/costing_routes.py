@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+import numpy as np
+
+from database import get_read_db
+from helpers import cost_snapshot, costing, uncertainty
+from models.lab_model import LabDB
+from models.param_models import (
+    ParamScenarioRequest,
+    ParamScenarioResponse,
+    ParamScenarioResult,
+    ParamSensitivityJob,
+    ParamSensitivityRequest,
+)
+
+router = APIRouter(prefix="/costing", tags=["Costing"])
+
+PAYER_COLUMNS = ["annual_credit", "annual_nhima", "annual_research", "annual_walkins"]
+
+
+def buildCostMatrix(base: np.ndarray, ids: np.ndarray, factors, overrides):
+    # one row of catalog costs per scenario
+    matrix = np.asarray(factors, dtype=float)[:, None] * base[None, :]
+
+    index = {id: i for i, id in enumerate(ids.tolist())}
+    for row, override in enumerate(overrides):
+        for id, cost in override.items():
+            if id in index:
+                matrix[row, index[id]] = cost
+
+    return matrix
+
+
+def buildVolumeMatrix(tests, data: costing.CostingInput, scenarios):
+    # scale each payer category and shift the annual total by the difference
+    payers = np.array(
+        [[getattr(test, column) for column in PAYER_COLUMNS] for test in tests],
+        dtype=float,
+    ).reshape(len(tests), len(PAYER_COLUMNS))
+    factors = np.array(
+        [
+            [getattr(scenario, f"{column}_factor") for column in PAYER_COLUMNS]
+            for scenario in scenarios
+        ],
+        dtype=float,
+    )
+
+    annual_total = data.annual_total[None, :] + (factors - 1) @ payers.T
+    return np.maximum(annual_total, 0)
+
+
+@router.post("/scenarios", response_model=ParamScenarioResponse)
+async def evaluate_scenarios(
+    request: ParamScenarioRequest, db: AsyncSession = Depends(get_read_db)
+):
+    tests, data = await cost_snapshot.load_costing_input(db)
+    scenarios = request.scenarios
+
+    baseline = costing.compute_costs(data)
+    baseline_cost = float(baseline.total_cost.sum())
+
+    # evaluate every scenario against the full catalog in one batched pass
+    reagent_totals, instrument_totals, totals = costing.scenario_totals(
+        data,
+        annual_total=buildVolumeMatrix(tests, data, scenarios),
+        reagent_cost=buildCostMatrix(
+            data.reagent_cost,
+            data.reagent_ids,
+            [scenario.reagent_cost_factor for scenario in scenarios],
+            [scenario.reagent_costs for scenario in scenarios],
+        ),
+        instrument_cost=buildCostMatrix(
+            data.instrument_cost,
+            data.instrument_ids,
+            [scenario.instrument_cost_factor for scenario in scenarios],
+            [scenario.instrument_costs for scenario in scenarios],
+        ),
+    )
+
+    results = [
+        ParamScenarioResult(
+            name=scenario.name,
+            reagent_cost=reagent_cost,
+            instrument_cost=instrument_cost,
+            total_cost=total_cost,
+            change=total_cost - baseline_cost,
+        )
+        for scenario, reagent_cost, instrument_cost, total_cost in zip(
+            scenarios,
+            reagent_totals.tolist(),
+            instrument_totals.tolist(),
+            totals.tolist(),
+        )
+    ]
+
+    return ParamScenarioResponse(
+        total_tests=len(tests), baseline_cost=baseline_cost, scenarios=results
+    )
+
+
+# jobs live in the memory of the worker that started them
+SENSITIVITY_WORKER_NOTE = (
+    "Jobs are kept in the memory of the worker process that started them, so "
+    "the API must run with a single worker (or sticky sessions) for the polls "
+    "to find them; the limit of running jobs is also per worker."
+)
+
+
+@router.post(
+    "/sensitivity",
+    response_model=ParamSensitivityJob,
+    description="Start a Monte Carlo sensitivity job and poll it with "
+    f"GET /costing/sensitivity/{{job_id}}. {SENSITIVITY_WORKER_NOTE}",
+)
+async def start_sensitivity(
+    request: ParamSensitivityRequest, db: AsyncSession = Depends(get_read_db)
+):
+    tests, data = await cost_snapshot.load_costing_input(db)
+
+    result = await db.execute(select(LabDB.id, LabDB.name))
+    lab_names = {lab.id: lab.name for lab in result.all()}
+
+    # sampling runs on the process pool; poll the job for progress
+    job_id = uncertainty.start_job(
+        tests,
+        data,
+        lab_names,
+        samples=request.samples,
+        reagent_cost_cv=request.reagent_cost_cv,
+        expiry_period_cv=request.expiry_period_cv,
+        volume_cv=request.volume_cv,
+        seed=request.seed,
+        shards=request.shards,
+    )
+    return uncertainty.jobs[job_id]
+
+
+@router.get(
+    "/sensitivity/{job_id}",
+    response_model=ParamSensitivityJob,
+    description=f"Get the progress and result of a sensitivity job. {SENSITIVITY_WORKER_NOTE}",
+)
+async def get_sensitivity(job_id: str):
+    job = uncertainty.jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=404, detail=f"Unable to find sensitivity job with id '{job_id}'"
+        )
+    return job
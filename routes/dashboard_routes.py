@@ -1,115 +1,109 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 
-from database import get_db
+from database import get_read_db, read_sessionmaker
 from models.instrument_model import InstrumentDB
 from models.instrument_model import InstrumentDB
 from models.lab_model import LabDB
 from models.param_models import (
     ParamDashboard,
+    ParamPayerRollup,
+    ParamRollupRow,
+    ParamRollups,
     ParamTestComponentDetail,
     ParamTestCost,
     ParamTestDetail,
 )
 from models.reagent_model import ReagentDB
+from models.test_cost_model import TestCostDB
 from models.test_model import Test, TestDB, TestWithDetail
 from models.user_model import UserDB
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+# rows fetched per round trip while streaming
+STREAM_BATCH_SIZE = 200
 
-async def updateInstrumentList(test: TestDB, db: AsyncSession):
-    # get instruments
-    result = await db.execute(select(InstrumentDB))
-    instruments = result.scalars().all()
-
-    # check loaded instruments against test instrument list and update with cost
-    if test.instrument_list:
-        for item in test.instrument_list:
-            for instrument in instruments:
-                if item["id"] == instrument.id:
-                    item["name"] = instrument.name
-                    item["total_cost"] = instrument.total_cost
-                    item["annual_cost"] = instrument.total_cost
-                    break
-
-    return test.instrument_list
-
-
-async def updateReagentList(test: TestDB, db: AsyncSession):
-    # get reagents
-    result = await db.execute(select(ReagentDB))
-    reagents = result.scalars().all()
-
-    # check loaded reagents against test reagent list and update with cost
-    if test.reagent_list:
-        for item in test.reagent_list:
-            for reagent in reagents:
-                if item["id"] == reagent.id:
-
-                    testsWithin = (test.annual_total * reagent.expiry_period) / 365
-                    testsUsable = min([testsWithin, reagent.tests_per_gru])
-                    consumed = (
-                        test.annual_total / testsUsable if testsUsable > 0 else 0
-                    )
-                    costPerUnit = (
-                        consumed / test.annual_total if test.annual_total> 0 else 0
-                    )
-                    costPerTest = costPerUnit * reagent.cost
-                    total_cost = costPerTest * test.annual_total
-
-                    item["name"] = reagent.name
-                    item["cost"] = reagent.cost
-                    item["expiry_period"] = reagent.expiry_period
-                    item["generic_reagent_unit"] = reagent.generic_reagent_unit
-                    item["quantity_per_gru"] = reagent.quantity_per_gru
-                    item["tests_per_grud"] = reagent.tests_per_gru
-                    item["test_actual"] = test.annual_total
-                    item["gru_consumed"] = consumed
-                    item["cost_per_test"] = costPerTest
-                    item["total_cost"] = total_cost
-
-                    break
-
-    return test.reagent_list
+PAYERS = ["credit", "nhima", "research", "walkins"]
 
 
-@router.get("/test-costing", response_model=ParamDashboard)
-async def get_test_dashboard(db: AsyncSession = Depends(get_db)):
+def payerCost(payer: str):
+    # share of the test cost allocated to the payer by annual volume, volume
+    # not attributed to any payer stays unallocated
+    return func.coalesce(
+        TestCostDB.total_cost
+        * getattr(TestDB, f"annual_{payer}")
+        / func.nullif(TestDB.annual_total, 0),
+        0,
+    )
+
+
+def rollupColumns(aggregate: bool):
+    # rollup columns, summed when aggregating
+    columns = [
+        TestDB.annual_credit,
+        TestDB.annual_nhima,
+        TestDB.annual_research,
+        TestDB.annual_walkins,
+        TestDB.annual_total,
+        TestCostDB.reagent_cost,
+        TestCostDB.instrument_cost,
+        TestCostDB.total_cost,
+    ]
+    labels = [column.key for column in columns]
+
+    columns += [payerCost(payer) for payer in PAYERS]
+    labels += [f"{payer}_cost" for payer in PAYERS]
+
+    if aggregate:
+        columns = [func.coalesce(func.sum(column), 0) for column in columns]
+
+    return [column.label(label) for column, label in zip(columns, labels)]
 
+
+async def buildTestDashboard(db: AsyncSession) -> ParamDashboard:
     total_tests = await db.scalar(select(func.count()).select_from(TestDB))
 
-    instruments = await db.scalar(select(func.count()).select_from(InstrumentDB))
+    total_instruments = await db.scalar(
+        select(func.count()).select_from(InstrumentDB)
+    )
 
-    reagents = await db.scalar(select(func.count()).select_from(ReagentDB))
+    total_reagents = await db.scalar(select(func.count()).select_from(ReagentDB))
 
     users = await db.scalar(select(func.count()).select_from(UserDB))
 
     labs = await db.scalar(select(func.count()).select_from(LabDB))
 
-    result = await db.execute(select(TestDB))
-    tests = result.scalars().all()
+    result = await db.execute(
+        select(TestCostDB, LabDB.name)
+        .join(LabDB, LabDB.id == TestCostDB.lab_id)
+        .order_by(TestCostDB.test_id)
+    )
 
     testCostList = []
 
-    # update details for each test
-    for test in tests:
-        reagentList = await updateReagentList(test, db)
-        instrumentList = await updateInstrumentList(test, db)
-
+    # read the costed snapshot of each test
+    for snapshot, lab_name in result.all():
         testCost = ParamTestCost(
-            name=test.name,
-            lab=test.lab.name,
-            total_cost=20000,
+            name=snapshot.name,
+            lab=lab_name,
+            total_cost=snapshot.total_cost,
             components=[
                 ParamTestComponentDetail(
-                    component="reagent", cost=3000, items=reagentList
+                    component="reagent",
+                    cost=snapshot.reagent_cost,
+                    items=snapshot.reagent_items,
                 ),
                 ParamTestComponentDetail(
-                    component="instrument", cost=4000, items=instrumentList
+                    component="instrument",
+                    cost=snapshot.instrument_cost,
+                    items=snapshot.instrument_items,
                 ),
             ],
         )
@@ -119,8 +113,123 @@ async def get_test_dashboard(db: AsyncSession = Depends(get_db)):
     return ParamDashboard(
         total_tests=total_tests,
         total_labs=labs,
-        total_instruments=instruments,
-        total_reagents=reagents,
+        total_instruments=total_instruments,
+        total_reagents=total_reagents,
         total_users=users,
         tests=testCostList,
     )
+
+
+@router.get("/test-costing", response_model=ParamDashboard)
+async def get_test_dashboard(db: AsyncSession = Depends(get_read_db)):
+    # tests are costed on write, so the report only reads their snapshots
+    return await buildTestDashboard(db)
+
+
+async def streamTestCosts(session_factory):
+    # own session, the request session is closed once streaming starts
+    async with session_factory() as session:
+        result = await session.stream(
+            select(
+                TestCostDB.name,
+                LabDB.name.label("lab"),
+                TestCostDB.total_cost,
+                TestCostDB.reagent_cost,
+                TestCostDB.reagent_items,
+                TestCostDB.instrument_cost,
+                TestCostDB.instrument_items,
+            )
+            .join(LabDB, LabDB.id == TestCostDB.lab_id)
+            .order_by(TestCostDB.test_id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+
+        # one ParamTestCost per line, plain rows so memory stays flat
+        async for row in result:
+            testCost = {
+                "name": row.name,
+                "lab": row.lab,
+                "total_cost": row.total_cost,
+                "components": [
+                    {
+                        "component": "reagent",
+                        "cost": row.reagent_cost,
+                        "items": row.reagent_items,
+                    },
+                    {
+                        "component": "instrument",
+                        "cost": row.instrument_cost,
+                        "items": row.instrument_items,
+                    },
+                ],
+            }
+            yield json.dumps(testCost) + "\n"
+
+
+@router.get("/test-costing/stream")
+async def stream_test_dashboard(request: Request):
+    return StreamingResponse(
+        streamTestCosts(read_sessionmaker(request)), media_type="application/x-ndjson"
+    )
+
+
+async def buildRollups(db: AsyncSession, lab_id: Optional[int]) -> ParamRollups:
+    # every section is limited to the lab when one is specified
+
+    # per lab
+    query = (
+        select(
+            LabDB.id,
+            LabDB.name,
+            func.count(TestDB.id).label("tests"),
+            *rollupColumns(aggregate=True),
+        )
+        .select_from(LabDB)
+        .outerjoin(TestDB, TestDB.lab_id == LabDB.id)
+        .outerjoin(TestCostDB, TestCostDB.test_id == TestDB.id)
+        .group_by(LabDB.id, LabDB.name)
+        .order_by(LabDB.id)
+    )
+    if lab_id is not None:
+        query = query.where(LabDB.id == lab_id)
+    result = await db.execute(query)
+    labs = [ParamRollupRow(**row) for row in result.mappings().all()]
+
+    # per test
+    query = (
+        select(TestDB.id, TestDB.name, *rollupColumns(aggregate=False))
+        .join(TestCostDB, TestCostDB.test_id == TestDB.id)
+        .order_by(TestDB.id)
+    )
+    if lab_id is not None:
+        query = query.where(TestDB.lab_id == lab_id)
+    result = await db.execute(query)
+    tests = [ParamRollupRow(tests=1, **row) for row in result.mappings().all()]
+
+    # per payer category, one aggregated row across the tests
+    query = (
+        select(*rollupColumns(aggregate=True))
+        .select_from(TestDB)
+        .join(TestCostDB, TestCostDB.test_id == TestDB.id)
+    )
+    if lab_id is not None:
+        query = query.where(TestDB.lab_id == lab_id)
+    result = await db.execute(query)
+    totals = result.mappings().one()
+    payers = [
+        ParamPayerRollup(
+            payer=payer,
+            annual_volume=totals[f"annual_{payer}"],
+            cost=totals[f"{payer}_cost"],
+        )
+        for payer in PAYERS
+    ]
+
+    return ParamRollups(labs=labs, tests=tests, payers=payers)
+
+
+@router.get("/rollups", response_model=ParamRollups)
+async def get_rollups(
+    lab_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)
+):
+    return await buildRollups(db, lab_id)
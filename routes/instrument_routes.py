@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 
-from database import get_db
-from models.instrument_model import Instrument, InstrumentDB, InstrumentWithDetail
-from models.user_model import UserDB
+from database import get_db, get_read_db
+from helpers import catalog_cache, cost_snapshot, etag, paging, projection, serializers
+from models.instrument_model import Instrument, InstrumentDB, InstrumentItem, InstrumentWithDetail
+from models.test_model import TestDB, TestWithDetail
+from models.user_model import UserDB, UserSimple
 
 router = APIRouter(prefix="/instruments", tags=["Instruments"])
 
+# columns the list can be sorted by
+SORT_COLUMNS = ("id", "name", "created_at")
+
+# relationships the compact list can expand
+EXPAND_RELATIONS = {"user": (UserDB, UserSimple, InstrumentDB.user_id)}
+
 
 @router.post("/create", response_model=InstrumentWithDetail)
 async def create(instrument: Instrument, db: AsyncSession = Depends(get_db)):
@@ -38,7 +46,12 @@ async def create(instrument: Instrument, db: AsyncSession = Depends(get_db)):
     )
     db.add(db_user)
     try:
+        await db.flush()
+        # link and recompute the tests whose lists already reference the new instrument
+        test_ids = await cost_snapshot.link_instrument_tests(db, db_user.id)
+        await cost_snapshot.refresh_test_costs(db, test_ids)
         await db.commit()
+        catalog_cache.bump()
         await db.refresh(db_user)
     except Exception as e:
         await db.rollback()
@@ -49,19 +62,49 @@ async def create(instrument: Instrument, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/id/{instrument_id}", response_model=InstrumentWithDetail)
-async def get_item(instrument_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(InstrumentDB).filter(InstrumentDB.id == instrument_id)
-    )
-    category = result.scalars().first()
+async def get_item(
+    instrument_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    fieldset = projection.parse_fields(fields, InstrumentDB, InstrumentWithDetail, EXPAND_RELATIONS)
+    query = projection.select_fields(InstrumentDB, fieldset) if fieldset else select(InstrumentDB)
+
+    result = await db.execute(query.filter(InstrumentDB.id == instrument_id))
+    category = result.first() if fieldset else result.scalars().first()
     if not category:
         raise HTTPException(
             status_code=404,
             detail=f"Unable to find instrument with id '{instrument_id}'",
         )
+    if fieldset:
+        return serializers.json_response(
+            projection.field_items([category], fieldset)[0], response
+        )
     return category
 
 
+@router.get("/{instrument_id}/tests", response_model=List[TestWithDetail])
+async def get_tests(instrument_id: int, db: AsyncSession = Depends(get_read_db)):
+    # check instrument exists
+    exists = await db.scalar(select(InstrumentDB.id).where(InstrumentDB.id == instrument_id))
+    if not exists:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unable to find instrument with id '{instrument_id}'",
+        )
+
+    # answered by the test_instrument.instrument_id index
+    test_ids = await cost_snapshot.get_instrument_test_ids(db, instrument_id)
+    result = await db.execute(
+        select(TestDB).where(TestDB.id.in_(test_ids)).order_by(TestDB.id)
+    )
+    return serializers.json_response(
+        serializers.serialize_all(result.scalars().all(), TestWithDetail)
+    )
+
+
 @router.put("/update/{instrument_id}", response_model=InstrumentWithDetail)
 async def update_item(
     instrument_id: int,
@@ -84,7 +127,12 @@ async def update_item(
         setattr(config, key, value)
 
     try:
+        await db.flush()
+        # recompute only the tests that reference this instrument
+        test_ids = await cost_snapshot.get_instrument_test_ids(db, config.id)
+        await cost_snapshot.refresh_test_costs(db, test_ids)
         await db.commit()
+        catalog_cache.bump()
         await db.refresh(config)
     except Exception as e:
         await db.rollback()
@@ -93,6 +141,62 @@ async def update_item(
 
 
 @router.get("/list", response_model=List[InstrumentWithDetail])
-async def list_items(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(InstrumentDB))
-    return result.scalars().all()
+async def list_items(
+    request: Request,
+    response: Response,
+    name: Optional[str] = Query(None, description="Name prefix"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # answer 304 without loading rows when nothing changed
+    not_modified = await etag.check_etag(db, request, response, InstrumentDB, UserDB)
+    if not_modified:
+        return not_modified
+
+    fieldset = projection.parse_fields(fields, InstrumentDB, InstrumentWithDetail, EXPAND_RELATIONS)
+    if fieldset:
+        # only the requested columns, the sort column keys the next page
+        sort = paging.sort_column(InstrumentDB, page, SORT_COLUMNS)
+        query = projection.select_fields(InstrumentDB, fieldset, sort)
+    else:
+        query = select(InstrumentDB)
+    if name:
+        query = query.where(InstrumentDB.name.like(paging.prefix_pattern(name)))
+
+    query = paging.paginate(query, InstrumentDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    if fieldset:
+        rows = paging.page_rows(result.all(), response, page)
+        return serializers.json_response(projection.field_items(rows, fieldset), response)
+
+    # pre-built serializer, the rows are not re-validated
+    rows = paging.page_rows(result.scalars().all(), response, page)
+    return serializers.json_response(
+        serializers.serialize_all(rows, InstrumentWithDetail), response
+    )
+
+
+@router.get("/list/compact", response_model=List[InstrumentItem])
+async def list_compact(
+    request: Request,
+    response: Response,
+    name: Optional[str] = Query(None, description="Name prefix"),
+    expand: Optional[str] = Query(None, description="Relationships to include: user"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # answer 304 without loading rows when nothing changed
+    not_modified = await etag.check_etag(db, request, response, InstrumentDB, UserDB)
+    if not_modified:
+        return not_modified
+
+    # only the listed columns, as row tuples
+    expanded = projection.parse_expand(expand, EXPAND_RELATIONS)
+    query = projection.select_items(InstrumentDB, InstrumentItem, expanded)
+    if name:
+        query = query.where(InstrumentDB.name.like(paging.prefix_pattern(name)))
+
+    query = paging.paginate(query, InstrumentDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    return projection.to_items(paging.page_rows(result.all(), response, page), expanded)
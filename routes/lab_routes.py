@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 
-from database import get_db
-from models.lab_model import Lab, LabDB, LabWithDetail
-from models.user_model import UserDB
+from database import get_db, get_read_db
+from helpers import catalog_cache, etag, paging, projection, serializers
+from models.lab_model import Lab, LabDB, LabItem, LabWithDetail
+from models.user_model import UserDB, UserSimple
 
 router = APIRouter(prefix="/labs", tags=["Labs"])
 
+# columns the list can be sorted by
+SORT_COLUMNS = ("id", "name", "created_at")
+
+# relationships the compact list can expand
+EXPAND_RELATIONS = {"user": (UserDB, UserSimple, LabDB.user_id)}
+
 
 @router.post("/create", response_model=LabWithDetail)
 async def create(lab: Lab, db: AsyncSession = Depends(get_db)):
@@ -32,6 +39,7 @@ async def create(lab: Lab, db: AsyncSession = Depends(get_db)):
     db.add(db_user)
     try:
         await db.commit()
+        catalog_cache.bump()
         await db.refresh(db_user)
     except Exception as e:
         await db.rollback()
@@ -41,14 +49,23 @@ async def create(lab: Lab, db: AsyncSession = Depends(get_db)):
     return db_user
 
 @router.get("/id/{lab_id}", response_model=LabWithDetail)
-async def get_item(lab_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(LabDB)
-        .filter(LabDB.id == lab_id)
-    )
-    category = result.scalars().first()
+async def get_item(
+    lab_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    fieldset = projection.parse_fields(fields, LabDB, LabWithDetail, EXPAND_RELATIONS)
+    query = projection.select_fields(LabDB, fieldset) if fieldset else select(LabDB)
+
+    result = await db.execute(query.filter(LabDB.id == lab_id))
+    category = result.first() if fieldset else result.scalars().first()
     if not category:
         raise HTTPException(status_code=404, detail=f"Unable to find lab with id '{lab_id}'")
+    if fieldset:
+        return serializers.json_response(
+            projection.field_items([category], fieldset)[0], response
+        )
     return category
 
 
@@ -69,6 +86,7 @@ async def update_item(lab_id: int, lab_update: Lab, db: AsyncSession = Depends(g
         
     try:
         await db.commit()
+        catalog_cache.bump()
         await db.refresh(config)
     except Exception as e:
         await db.rollback()
@@ -76,6 +94,62 @@ async def update_item(lab_id: int, lab_update: Lab, db: AsyncSession = Depends(g
     return config
 
 @router.get("/list", response_model=List[LabWithDetail])
-async def list_items(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(LabDB))
-    return result.scalars().all()
+async def list_items(
+    request: Request,
+    response: Response,
+    name: Optional[str] = Query(None, description="Name prefix"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # answer 304 without loading rows when nothing changed
+    not_modified = await etag.check_etag(db, request, response, LabDB, UserDB)
+    if not_modified:
+        return not_modified
+
+    fieldset = projection.parse_fields(fields, LabDB, LabWithDetail, EXPAND_RELATIONS)
+    if fieldset:
+        # only the requested columns, the sort column keys the next page
+        sort = paging.sort_column(LabDB, page, SORT_COLUMNS)
+        query = projection.select_fields(LabDB, fieldset, sort)
+    else:
+        query = select(LabDB)
+    if name:
+        query = query.where(LabDB.name.like(paging.prefix_pattern(name)))
+
+    query = paging.paginate(query, LabDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    if fieldset:
+        rows = paging.page_rows(result.all(), response, page)
+        return serializers.json_response(projection.field_items(rows, fieldset), response)
+
+    # pre-built serializer, the rows are not re-validated
+    rows = paging.page_rows(result.scalars().all(), response, page)
+    return serializers.json_response(
+        serializers.serialize_all(rows, LabWithDetail), response
+    )
+
+
+@router.get("/list/compact", response_model=List[LabItem])
+async def list_compact(
+    request: Request,
+    response: Response,
+    name: Optional[str] = Query(None, description="Name prefix"),
+    expand: Optional[str] = Query(None, description="Relationships to include: user"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # answer 304 without loading rows when nothing changed
+    not_modified = await etag.check_etag(db, request, response, LabDB, UserDB)
+    if not_modified:
+        return not_modified
+
+    # only the listed columns, as row tuples
+    expanded = projection.parse_expand(expand, EXPAND_RELATIONS)
+    query = projection.select_items(LabDB, LabItem, expanded)
+    if name:
+        query = query.where(LabDB.name.like(paging.prefix_pattern(name)))
+
+    query = paging.paginate(query, LabDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    return projection.to_items(paging.page_rows(result.all(), response, page), expanded)
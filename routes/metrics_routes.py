@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from helpers import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # request, latency and pool metrics of this worker process
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
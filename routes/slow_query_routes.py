@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List, Optional
+
+from database import get_db
+from helpers.auth import get_admin_user
+from models.slow_query_model import SlowQuery, SlowQueryDB
+
+router = APIRouter(
+    prefix="/slow-queries",
+    tags=["Slow Queries"],
+    dependencies=[Depends(get_admin_user)],
+)
+
+
+@router.get("/list", response_model=List[SlowQuery])
+async def list_items(
+    route: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    # most recent explained slow queries first, optionally of one route
+    query = select(SlowQueryDB)
+    if route is not None:
+        query = query.where(SlowQueryDB.route == route)
+
+    result = await db.execute(
+        query.order_by(SlowQueryDB.created_at.desc(), SlowQueryDB.id.desc()).limit(limit)
+    )
+    return result.scalars().all()
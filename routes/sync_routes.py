@@ -0,0 +1,67 @@
+import base64
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import noload
+
+from database import get_read_db
+from models.instrument_model import InstrumentDB
+from models.lab_model import LabDB
+from models.param_models import ParamSync
+from models.reagent_model import ReagentDB
+from models.test_model import TestDB
+from models.user_model import UserDB
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+# Rows carry the id of the transaction that last wrote them (changed_txid).
+# The cursor is the oldest transaction still running when the sync started:
+# every older one has finished, so the next sync resumes there and misses
+# no commit however late it lands. Rows written after that point can be
+# returned twice, so clients apply rows by id. Updates in raw SQL bypass the
+# column's onupdate and are not stamped; inserts always are, by its default.
+
+SYNC_TABLES = {
+    "labs": LabDB,
+    "tests": TestDB,
+    "reagents": ReagentDB,
+    "instruments": InstrumentDB,
+    "users": UserDB,
+}
+
+
+def encodeCursor(txid: int) -> str:
+    return base64.urlsafe_b64encode(str(txid).encode("utf-8")).decode("ascii")
+
+
+def decodeCursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Invalid sync cursor '{cursor}'")
+
+
+@router.get("", response_model=ParamSync)
+async def sync(since: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    since_txid = decodeCursor(since) if since else None
+
+    # taken before the reads, which then see every transaction below it
+    latest = await db.scalar(
+        select(func.txid_snapshot_xmin(func.txid_current_snapshot()))
+    )
+
+    changes = {}
+    for key, model in SYNC_TABLES.items():
+        query = select(model).options(noload("*")).order_by(model.id)
+
+        # answered by the changed_txid indexes
+        if since_txid is not None:
+            query = query.where(model.changed_txid >= since_txid)
+
+        result = await db.execute(query)
+        changes[key] = result.scalars().all()
+
+    return ParamSync(cursor=encodeCursor(latest), **changes)
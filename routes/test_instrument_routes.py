@@ -3,7 +3,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 
-from database import get_db
+from database import get_db, get_read_db
+from helpers import cost_snapshot
 from models.test_instrument_model import TestInstrument, TestInstrumentDB, TestInstrumentWithDetail
 from models.user_model import UserDB
 
@@ -27,11 +28,26 @@ async def create(testinstrument: TestInstrument, db: AsyncSession = Depends(get_
         # details
         test_id=testinstrument.test_id,
         instrument_id=testinstrument.instrument_id,
+        # annual volumnes
+        annual_volume=testinstrument.annual_volume,
+        percent_volume=testinstrument.percent_volume,
+        annual_cost=testinstrument.annual_cost,
         # service
         created_by=user.email,
     )
     db.add(db_user)
     try:
+        await db.flush()
+        # keep the test's instrument list in step with the new link
+        await cost_snapshot.sync_list_item(
+            db,
+            "instrument_list",
+            None,
+            (db_user.test_id, db_user.instrument_id),
+            {"percent_volume": db_user.percent_volume},
+        )
+        # recompute the linked test
+        await cost_snapshot.refresh_test_costs(db, [db_user.test_id])
         await db.commit()
         await db.refresh(db_user)
     except Exception as e:
@@ -43,7 +59,7 @@ async def create(testinstrument: TestInstrument, db: AsyncSession = Depends(get_
 
 
 @router.get("/id/{testinstrument_id}", response_model=TestInstrumentWithDetail)
-async def get_item(testinstrument_id: int, db: AsyncSession = Depends(get_db)):
+async def get_item(testinstrument_id: int, db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(TestInstrumentDB).filter(TestInstrumentDB.id == testinstrument_id)
     )
@@ -73,11 +89,24 @@ async def update_item(
             detail=f"Unable to find testinstrument with id '{testinstrument_id}'",
         )
 
+    previous = (config.test_id, config.instrument_id)
+
     # Update fields that are not None
     for key, value in testinstrument_update.dict(exclude_unset=True).items():
         setattr(config, key, value)
 
     try:
+        await db.flush()
+        # keep the test's instrument list in step with the link
+        await cost_snapshot.sync_list_item(
+            db,
+            "instrument_list",
+            previous,
+            (config.test_id, config.instrument_id),
+            {"percent_volume": config.percent_volume},
+        )
+        # recompute the linked tests, including the one the link moved from
+        await cost_snapshot.refresh_test_costs(db, {previous[0], config.test_id})
         await db.commit()
         await db.refresh(config)
     except Exception as e:
@@ -87,6 +116,6 @@ async def update_item(
 
 
 @router.get("/list", response_model=List[TestInstrumentWithDetail])
-async def list_items(db: AsyncSession = Depends(get_db)):
+async def list_items(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(TestInstrumentDB))
     return result.scalars().all()
@@ -3,7 +3,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 
-from database import get_db
+from database import get_db, get_read_db
+from helpers import cost_snapshot
 from models.test_reagent_model import TestReagent, TestReagentDB, TestReagentWithDetail
 from models.user_model import UserDB
 
@@ -27,11 +28,26 @@ async def create(testreagent: TestReagent, db: AsyncSession = Depends(get_db)):
         # details
         test_id=testreagent.test_id,
         reagent_id=testreagent.reagent_id,
+        # annual
+        test_no=testreagent.test_no,
+        actual_test_no=testreagent.actual_test_no,
+        actual_test_cost=testreagent.actual_test_cost,
         # service
         created_by=user.email,
     )
     db.add(db_user)
     try:
+        await db.flush()
+        # keep the test's reagent list in step with the new link
+        await cost_snapshot.sync_list_item(
+            db,
+            "reagent_list",
+            None,
+            (db_user.test_id, db_user.reagent_id),
+            {},
+        )
+        # recompute the linked test
+        await cost_snapshot.refresh_test_costs(db, [db_user.test_id])
         await db.commit()
         await db.refresh(db_user)
     except Exception as e:
@@ -43,7 +59,7 @@ async def create(testreagent: TestReagent, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/id/{testreagent_id}", response_model=TestReagentWithDetail)
-async def get_item(testreagent_id: int, db: AsyncSession = Depends(get_db)):
+async def get_item(testreagent_id: int, db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(TestReagentDB).filter(TestReagentDB.id == testreagent_id)
     )
@@ -73,11 +89,24 @@ async def update_item(
             detail=f"Unable to find testreagent with id '{testreagent_id}'",
         )
 
+    previous = (config.test_id, config.reagent_id)
+
     # Update fields that are not None
     for key, value in testreagent_update.dict(exclude_unset=True).items():
         setattr(config, key, value)
 
     try:
+        await db.flush()
+        # keep the test's reagent list in step with the link
+        await cost_snapshot.sync_list_item(
+            db,
+            "reagent_list",
+            previous,
+            (config.test_id, config.reagent_id),
+            {},
+        )
+        # recompute the linked tests, including the one the link moved from
+        await cost_snapshot.refresh_test_costs(db, {previous[0], config.test_id})
         await db.commit()
         await db.refresh(config)
     except Exception as e:
@@ -87,6 +116,6 @@ async def update_item(
 
 
 @router.get("/list", response_model=List[TestReagentWithDetail])
-async def list_items(db: AsyncSession = Depends(get_db)):
+async def list_items(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(TestReagentDB))
     return result.scalars().all()
@@ -1,20 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 
-from database import get_db
+from database import get_db, get_read_db
+from helpers import catalog_cache, cost_snapshot, etag, paging, projection, serializers
 from models.instrument_model import InstrumentDB
 from models.instrument_model import InstrumentDB
-from models.lab_model import LabDB
+from models.lab_model import LabDB, LabSimple
 from models.param_models import ParamTestDetail
 from models.reagent_model import ReagentDB
-from models.test_model import Test, TestDB, TestWithDetail
-from models.user_model import UserDB
+from models.test_model import Test, TestDB, TestItem, TestWithDetail
+from models.user_model import UserDB, UserSimple
 
 router = APIRouter(prefix="/tests", tags=["Tests"])
 
+# columns the list can be sorted by
+SORT_COLUMNS = ("id", "name", "created_at")
+
+# relationships the compact list can expand
+EXPAND_RELATIONS = {
+    "user": (UserDB, UserSimple, TestDB.user_id),
+    "lab": (LabDB, LabSimple, TestDB.lab_id),
+}
+
 
 @router.post("/create", response_model=TestWithDetail)
 async def create(test: Test, db: AsyncSession = Depends(get_db)):
@@ -29,6 +39,8 @@ async def create(test: Test, db: AsyncSession = Depends(get_db)):
     db_user = TestDB(
         # user
         user_id=test.user_id,
+        # lab
+        lab_id=test.lab_id,
         # details
         name=test.name,
         description=test.description,
@@ -56,6 +68,10 @@ async def create(test: Test, db: AsyncSession = Depends(get_db)):
     )
     db.add(db_user)
     try:
+        await db.flush()
+        # link and cost the new test
+        await cost_snapshot.sync_test_links(db, [db_user.id])
+        await cost_snapshot.refresh_test_costs(db, [db_user.id])
         await db.commit()
         await db.refresh(db_user)
     except Exception as e:
@@ -65,26 +81,31 @@ async def create(test: Test, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/id/{test_id}", response_model=TestWithDetail)
-async def get_item(test_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(TestDB).filter(TestDB.id == test_id))
-    category = result.scalars().first()
+async def get_item(
+    test_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    fieldset = projection.parse_fields(fields, TestDB, TestWithDetail, EXPAND_RELATIONS)
+    query = projection.select_fields(TestDB, fieldset) if fieldset else select(TestDB)
+
+    result = await db.execute(query.filter(TestDB.id == test_id))
+    category = result.first() if fieldset else result.scalars().first()
     if not category:
         raise HTTPException(
             status_code=404, detail=f"Unable to find test with id '{test_id}'"
         )
+    if fieldset:
+        return serializers.json_response(
+            projection.field_items([category], fieldset)[0], response
+        )
     return category
 
 
 @router.get("/detail/{test_id}", response_model=ParamTestDetail)
 async def get_test_detail(test_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(InstrumentDB))
-    instruments = result.scalars().all()
-
-    result = await db.execute(select(ReagentDB))
-    reagents = result.scalars().all()
-
-    result = await db.execute(select(LabDB))
-    labs = result.scalars().all()
+    catalog = await catalog_cache.get_catalog(db)
 
     result = await db.execute(select(TestDB).filter(TestDB.id == test_id))
     test = result.scalars().first()
@@ -94,23 +115,31 @@ async def get_test_detail(test_id: int, db: AsyncSession = Depends(get_db)):
         )
 
     return ParamTestDetail(
-        labs=labs, reagents=reagents, instruments=instruments, test=test
+        labs=catalog["labs"],
+        reagents=catalog["reagents"],
+        instruments=catalog["instruments"],
+        test=test,
     )
 
 
 @router.get("/param", response_model=ParamTestDetail)
-async def get_test_pram(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(InstrumentDB))
-    instruments = result.scalars().all()
-
-    result = await db.execute(select(ReagentDB))
-    reagents = result.scalars().all()
+async def get_test_pram(
+    request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    # served from memory until a lab, reagent or instrument write
+    catalog = await catalog_cache.get_catalog(db)
 
-    result = await db.execute(select(LabDB))
-    labs = result.scalars().all()
+    # the ETag is the digest of the cached catalog, so a warm request answers
+    # 304 without touching the database and never tags a stale body as fresh
+    not_modified = etag.match_etag(catalog["etag"], request, response)
+    if not_modified:
+        return not_modified
 
     return ParamTestDetail(
-        labs=labs, reagents=reagents, instruments=instruments, test=None
+        labs=catalog["labs"],
+        reagents=catalog["reagents"],
+        instruments=catalog["instruments"],
+        test=None,
     )
 
 
@@ -131,6 +160,10 @@ async def update_item(
         setattr(config, key, value)
 
     try:
+        await db.flush()
+        # relink and recompute the updated test
+        await cost_snapshot.sync_test_links(db, [config.id])
+        await cost_snapshot.refresh_test_costs(db, [config.id])
         await db.commit()
         await db.refresh(config)
     except Exception as e:
@@ -140,6 +173,68 @@ async def update_item(
 
 
 @router.get("/list", response_model=List[TestWithDetail])
-async def list_items(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(TestDB))
-    return result.scalars().all()
+async def list_items(
+    request: Request,
+    response: Response,
+    lab_id: Optional[int] = None,
+    name: Optional[str] = Query(None, description="Name prefix"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # answer 304 without loading rows when nothing changed
+    not_modified = await etag.check_etag(db, request, response, TestDB, LabDB, UserDB)
+    if not_modified:
+        return not_modified
+
+    fieldset = projection.parse_fields(fields, TestDB, TestWithDetail, EXPAND_RELATIONS)
+    if fieldset:
+        # only the requested columns, the sort column keys the next page
+        sort = paging.sort_column(TestDB, page, SORT_COLUMNS)
+        query = projection.select_fields(TestDB, fieldset, sort)
+    else:
+        query = select(TestDB)
+    if lab_id is not None:
+        query = query.where(TestDB.lab_id == lab_id)
+    if name:
+        query = query.where(TestDB.name.like(paging.prefix_pattern(name)))
+
+    query = paging.paginate(query, TestDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    if fieldset:
+        rows = paging.page_rows(result.all(), response, page)
+        return serializers.json_response(projection.field_items(rows, fieldset), response)
+
+    # pre-built serializer, the rows are not re-validated
+    rows = paging.page_rows(result.scalars().all(), response, page)
+    return serializers.json_response(
+        serializers.serialize_all(rows, TestWithDetail), response
+    )
+
+
+@router.get("/list/compact", response_model=List[TestItem])
+async def list_compact(
+    request: Request,
+    response: Response,
+    lab_id: Optional[int] = None,
+    name: Optional[str] = Query(None, description="Name prefix"),
+    expand: Optional[str] = Query(None, description="Relationships to include: user, lab"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # answer 304 without loading rows when nothing changed
+    not_modified = await etag.check_etag(db, request, response, TestDB, LabDB, UserDB)
+    if not_modified:
+        return not_modified
+
+    # only the listed columns, as row tuples
+    expanded = projection.parse_expand(expand, EXPAND_RELATIONS)
+    query = projection.select_items(TestDB, TestItem, expanded)
+    if lab_id is not None:
+        query = query.where(TestDB.lab_id == lab_id)
+    if name:
+        query = query.where(TestDB.name.like(paging.prefix_pattern(name)))
+
+    query = paging.paginate(query, TestDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    return projection.to_items(paging.page_rows(result.all(), response, page), expanded)
@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 
-from database import get_db
-from helpers import assist
+from database import get_db, get_read_db
+from helpers import assist, auth, paging, projection, serializers
 from models.user_model import User, UserDB, UserSimple, UserWithDetail
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+# columns the list can be sorted by
+SORT_COLUMNS = ("id", "email", "created_at")
+
+# fields that can not be selected
+HIDDEN_FIELDS = ("password",)
+
 
 @router.post("/create", response_model=User)
 async def create_user(user: User, db: AsyncSession = Depends(get_db)):
+    # hash before the first query, no connection is held while hashing
+    password = await assist.hash_password_async(user.password)
+
     # Check duplicate email
     result = await db.execute(select(UserDB).where(UserDB.email == user.email))
     existing = result.scalar_one_or_none()
@@ -36,7 +45,7 @@ async def create_user(user: User, db: AsyncSession = Depends(get_db)):
         address_postal=user.address_postal,
         # account
         role=user.role,
-        password=assist.hash_password(user.password),
+        password=password,
         # approval
         status_id=user.status_id,
         stage_id=user.stage_id,
@@ -55,6 +64,12 @@ async def create_user(user: User, db: AsyncSession = Depends(get_db)):
 
 @router.put("/update/{user_id}", response_model=UserWithDetail)
 async def update_configuration(user_id: int, config_update: User, db: AsyncSession = Depends(get_db)):
+    values = config_update.dict(exclude_unset=True)
+
+    # hash before the first query, no connection is held while hashing
+    if "password" in values:
+        values["password"] = await assist.hash_password_async(values["password"])
+
     result = await db.execute(
         select(UserDB)
         .where(UserDB.id == user_id)
@@ -65,12 +80,8 @@ async def update_configuration(user_id: int, config_update: User, db: AsyncSessi
         raise HTTPException(status_code=404, detail=f"Unable to find user with id '{user_id}'")
     
     # Update fields that are not None
-    for key, value in config_update.dict(exclude_unset=True).items():
-        # if password, encrypt
-        if key == 'password':
-            setattr(config, key, assist.hash_password(value))
-        else:
-            setattr(config, key, value)
+    for key, value in values.items():
+        setattr(config, key, value)
         
     try:
         await db.commit()
@@ -78,12 +89,25 @@ async def update_configuration(user_id: int, config_update: User, db: AsyncSessi
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=400, detail=f"Unable to update user {e}")
+
+    # cached tokens carry the old user
+    auth.invalidate_user(user_id)
     return config
 
 @router.get("/id/{user_id}", response_model=UserWithDetail)
-async def get_user_id(user_id: int, db: AsyncSession = Depends(get_db)):
+async def get_user_id(
+    user_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    fieldset = projection.parse_fields(
+        fields, UserDB, UserWithDetail, {}, hidden=HIDDEN_FIELDS
+    )
+    query = projection.select_fields(UserDB, fieldset) if fieldset else select(UserDB)
+
     result = await db.execute(
-        select(UserDB)
+        query
         # .options(
         #    joinedload(TransactionDB.post),
         #    joinedload(TransactionDB.status),
@@ -93,16 +117,20 @@ async def get_user_id(user_id: int, db: AsyncSession = Depends(get_db)):
         # )
         .filter(UserDB.id == user_id)
     )
-    transaction = result.scalars().first()
+    transaction = result.first() if fieldset else result.scalars().first()
     if not transaction:
         raise HTTPException(
             status_code=404, detail=f"Unable to find user with specified id '{user_id}'"
         )
+    if fieldset:
+        return serializers.json_response(
+            projection.field_items([transaction], fieldset)[0], response
+        )
     return transaction
 
 
 @router.get("/email/{user_email}", response_model=List[UserSimple])
-async def get_user_email(user_email: str, db: AsyncSession = Depends(get_db)):
+async def get_user_email(user_email: str, db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(UserDB)
         .filter(UserDB.email == user_email)
@@ -117,6 +145,36 @@ async def get_user_email(user_email: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/list", response_model=List[UserWithDetail])
-async def list_users(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(UserDB))
-    return result.scalars().all()
+async def list_users(
+    response: Response,
+    email: Optional[str] = Query(None, description="Email prefix"),
+    role: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    page: paging.PageParams = Depends(paging.page_params),
+    db: AsyncSession = Depends(get_read_db),
+):
+    fieldset = projection.parse_fields(
+        fields, UserDB, UserWithDetail, {}, hidden=HIDDEN_FIELDS
+    )
+    if fieldset:
+        # only the requested columns, the sort column keys the next page
+        sort = paging.sort_column(UserDB, page, SORT_COLUMNS)
+        query = projection.select_fields(UserDB, fieldset, sort)
+    else:
+        query = select(UserDB)
+    if email:
+        query = query.where(UserDB.email.like(paging.prefix_pattern(email)))
+    if role is not None:
+        query = query.where(UserDB.role == role)
+
+    query = paging.paginate(query, UserDB, page, SORT_COLUMNS)
+    result = await db.execute(query)
+    if fieldset:
+        rows = paging.page_rows(result.all(), response, page)
+        return serializers.json_response(projection.field_items(rows, fieldset), response)
+
+    # pre-built serializer, the rows are not re-validated
+    rows = paging.page_rows(result.scalars().all(), response, page)
+    return serializers.json_response(
+        serializers.serialize_all(rows, UserWithDetail), response
+    )
@@ -0,0 +1,82 @@
+from typing import Optional
+
+from pydantic import BaseSettings, Field
+from sqlalchemy.engine import make_url
+
+
+class Settings(BaseSettings):
+    """
+    Deployment settings, read from the environment or a .env file. Each
+    field maps to the upper case environment variable of its name.
+    """
+
+    # production, development or test
+    app_env: str = "production"
+
+    # database, credentials come from the environment (DATABASE_URL, or the
+    # PGUSER/PGPASSWORD variables and ~/.pgpass asyncpg reads); none are
+    # committed
+    database_url: str = "postgresql+asyncpg://localhost:5432/ccl-test-costing"
+    db_echo: bool = False
+
+    # optional read replica for read-only routes, same pool settings
+    database_read_url: Optional[str] = None
+
+    # connection pool
+    db_pool_size: int = Field(5, ge=1)
+    db_max_overflow: int = Field(10, ge=0)
+    db_pool_timeout: float = Field(30, gt=0)
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+
+    # asyncpg statement caches, per connection
+    db_statement_cache_size: int = Field(100, ge=0)
+
+    # transaction pooling PgBouncer: no statement caches and unique
+    # prepared statement names
+    db_pgbouncer: bool = False
+
+    # apply pending migrations when a worker starts, for development only,
+    # deployments run python -m migrations upgrade once instead
+    db_migrate_on_startup: bool = False
+
+    # request instrumentation: the Server-Timing header with the database
+    # time and statements, and in development or test a warning when one
+    # statement shape runs more than the threshold times in a request
+    server_timing: bool = True
+    db_repeated_statement_threshold: int = Field(10, ge=1)
+
+    # slow query log: statements over the threshold are logged as JSON, and
+    # the sampled fraction of the slow selects is explained into the
+    # slow_queries table, which re-runs them; a 0 threshold disables it
+    slow_query_ms: float = Field(500, ge=0)
+    slow_query_explain_sample: float = Field(0, ge=0, le=1)
+
+    # single request profiles, asked for with the X-Profile header or the
+    # profile query parameter by an administrator; off adds no middleware
+    profiler_enabled: bool = False
+    profiles_dir: str = "profiles"
+    profiler_interval_ms: float = Field(5, gt=0)
+
+    # password hashing
+    password_hash_workers: int = Field(4, ge=1)
+
+    class Config:
+        env_file = ".env"
+
+
+settings = Settings()
+
+
+def describe() -> dict:
+    """
+    Get the effective settings, with the database password masked
+
+    Returns:
+        dict: The settings by name.
+    """
+    values = settings.dict()
+    for name in ("database_url", "database_read_url"):
+        if values[name]:
+            values[name] = make_url(values[name]).render_as_string(hide_password=True)
+    return values
@@ -0,0 +1,203 @@
+"""
+The batched NumPy costing must give the same snapshot items and per-test
+costs as the per-item loop the dashboard used before it, including which
+fields are ints.
+"""
+
+import copy
+import math
+from types import SimpleNamespace
+
+from helpers import cost_snapshot, costing
+
+
+def make_reagent(id, cost, expiry_period, tests_per_gru):
+    # float columns come back from the database as floats
+    return SimpleNamespace(
+        id=id,
+        name=f"Reagent {id}",
+        cost=float(cost),
+        expiry_period=float(expiry_period),
+        generic_reagent_unit="ml",
+        quantity_per_gru=1.0,
+        tests_per_gru=float(tests_per_gru),
+    )
+
+
+def make_instrument(id, total_cost):
+    return SimpleNamespace(id=id, name=f"Instrument {id}", total_cost=float(total_cost))
+
+
+def make_test(id, annual_total, reagent_list, instrument_list):
+    return SimpleNamespace(
+        id=id,
+        lab_id=1,
+        name=f"Test {id}",
+        annual_total=annual_total,
+        reagent_list=reagent_list,
+        instrument_list=instrument_list,
+    )
+
+
+REAGENTS = [
+    make_reagent(1, 10, 30, 50),
+    make_reagent(2, 2.75, 365, 1000),
+    # no usable tests
+    make_reagent(3, 5, 30, 0),
+    # tiny cost per test, exponent floats
+    make_reagent(4, 0.0001, 7, 3),
+]
+
+INSTRUMENTS = [make_instrument(1, 500), make_instrument(2, 1234.5)]
+
+TESTS = [
+    make_test(
+        1,
+        100,
+        [{"id": 1, "note": "kept"}, {"id": 2}],
+        [{"id": 1, "percent_volume": 50}],
+    ),
+    make_test(
+        2,
+        2500,
+        [{"id": 2}, {"id": 3}, {"id": 4}, {"id": 99}],
+        [{"id": 2}, {"id": 1}],
+    ),
+    # nothing is usable without annual volume
+    make_test(3, 0, [{"id": 1}, {"id": 4}], [{"id": 2}]),
+    # a component listed twice is costed twice
+    make_test(4, 7, [{"id": 1}, {"id": 1}], []),
+    make_test(5, 40, [], []),
+]
+
+
+def loop_items(test):
+    # the per-item costing of the dashboard before the batched costing
+    reagent_list = copy.deepcopy(test.reagent_list)
+    for item in reagent_list:
+        for reagent in REAGENTS:
+            if item["id"] == reagent.id:
+                testsWithin = (test.annual_total * reagent.expiry_period) / 365
+                testsUsable = min([testsWithin, reagent.tests_per_gru])
+                consumed = test.annual_total / testsUsable if testsUsable > 0 else 0
+                costPerUnit = (
+                    consumed / test.annual_total if test.annual_total > 0 else 0
+                )
+                costPerTest = costPerUnit * reagent.cost
+                total_cost = costPerTest * test.annual_total
+
+                item["name"] = reagent.name
+                item["cost"] = reagent.cost
+                item["expiry_period"] = reagent.expiry_period
+                item["generic_reagent_unit"] = reagent.generic_reagent_unit
+                item["quantity_per_gru"] = reagent.quantity_per_gru
+                item["tests_per_grud"] = reagent.tests_per_gru
+                item["test_actual"] = test.annual_total
+                item["gru_consumed"] = consumed
+                item["cost_per_test"] = costPerTest
+                item["total_cost"] = total_cost
+                break
+
+    instrument_list = copy.deepcopy(test.instrument_list)
+    for item in instrument_list:
+        for instrument in INSTRUMENTS:
+            if item["id"] == instrument.id:
+                item["name"] = instrument.name
+                item["total_cost"] = instrument.total_cost
+                item["annual_cost"] = instrument.total_cost
+                break
+
+    return reagent_list, instrument_list
+
+
+def batched_items():
+    # the links sync_test_links writes: one per listed, existing component
+    reagents = {reagent.id: reagent for reagent in REAGENTS}
+    instruments = {instrument.id: instrument for instrument in INSTRUMENTS}
+    reagent_pairs = [
+        (test.id, item["id"])
+        for test in TESTS
+        for item in test.reagent_list
+        if item["id"] in reagents
+    ]
+    instrument_pairs = [
+        (test.id, item["id"])
+        for test in TESTS
+        for item in test.instrument_list
+        if item["id"] in instruments
+    ]
+
+    data = costing.build_costing_input(
+        TESTS, reagents, instruments, reagent_pairs, instrument_pairs
+    )
+    costs = costing.compute_costs(data)
+    cost_snapshot._update_reagent_items(TESTS, data, costs)
+    cost_snapshot._update_instrument_items(data)
+
+    reagent_items = cost_snapshot._snapshot_items(
+        [test.reagent_list for test in TESTS],
+        data.reagent_pair_test,
+        data.reagent_items,
+    )
+    instrument_items = cost_snapshot._snapshot_items(
+        [test.instrument_list for test in TESTS],
+        data.instrument_pair_test,
+        data.instrument_items,
+    )
+    return reagent_items, instrument_items, costs
+
+
+def assert_same(batched, expected):
+    # same keys, same types and the same values to the last few ulps
+    assert type(batched) is type(expected), (batched, expected)
+    if isinstance(expected, dict):
+        assert batched.keys() == expected.keys()
+        for key in expected:
+            assert_same(batched[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(batched) == len(expected)
+        for batched_value, expected_value in zip(batched, expected):
+            assert_same(batched_value, expected_value)
+    elif isinstance(expected, float):
+        assert math.isclose(batched, expected, rel_tol=1e-12, abs_tol=1e-300)
+    else:
+        assert batched == expected
+
+
+def test_items_match_the_per_item_loop():
+    reagent_items, instrument_items, _ = batched_items()
+
+    for i, test in enumerate(TESTS):
+        expected_reagents, expected_instruments = loop_items(test)
+        assert_same(reagent_items[i], expected_reagents)
+        assert_same(instrument_items[i], expected_instruments)
+
+
+def test_int_fields_stay_ints():
+    reagent_items, _, _ = batched_items()
+
+    for items in reagent_items:
+        for item in items:
+            if "test_actual" in item:
+                assert type(item["test_actual"]) is int
+    # no usable tests gives an int 0, as in the loop
+    assert type(reagent_items[1][1]["gru_consumed"]) is int
+    assert type(reagent_items[2][0]["gru_consumed"]) is int
+    assert type(reagent_items[0][0]["gru_consumed"]) is float
+
+
+def test_costs_match_the_per_item_loop():
+    _, _, costs = batched_items()
+
+    for i, test in enumerate(TESTS):
+        expected_reagents, expected_instruments = loop_items(test)
+        reagent_cost = sum(item.get("total_cost", 0) for item in expected_reagents)
+        instrument_cost = sum(
+            item.get("total_cost", 0) for item in expected_instruments
+        )
+
+        assert math.isclose(costs.reagent_cost[i], reagent_cost, rel_tol=1e-12)
+        assert math.isclose(costs.instrument_cost[i], instrument_cost, rel_tol=1e-12)
+        assert math.isclose(
+            costs.total_cost[i], reagent_cost + instrument_cost, rel_tol=1e-12
+        )
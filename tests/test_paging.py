@@ -0,0 +1,73 @@
+"""
+Page cursors are checked against the sort column, so a tampered or stale
+cursor is a 400 rather than a database error.
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from helpers import paging
+from models import test_model
+
+
+def make_cursor(value, id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, id]).encode()).decode()
+
+
+@pytest.mark.parametrize(
+    "sort, value, id, expected",
+    [
+        (
+            "created_at",
+            "2025-03-01T08:30:15+00:00",
+            3,
+            datetime(2025, 3, 1, 8, 30, 15, tzinfo=timezone.utc),
+        ),
+        # rows without a timestamp
+        ("created_at", None, 3, None),
+        ("name", "Full blood count", 7, "Full blood count"),
+        ("id", 7, 7, 7),
+    ],
+)
+def test_valid_cursors(sort, value, id, expected):
+    column = getattr(test_model.TestDB, sort)
+    assert paging.decode_cursor(make_cursor(value, id), column) == (expected, id)
+
+
+def test_round_trip():
+    stamp = datetime(2025, 3, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = paging.encode_cursor(stamp, 12)
+    assert paging.decode_cursor(cursor, test_model.TestDB.created_at) == (stamp, 12)
+
+
+@pytest.mark.parametrize(
+    "sort, value, id",
+    [
+        ("created_at", "yesterday", 1),
+        ("created_at", 1700000000, 1),
+        ("created_at", "2025-03-01T08:30:15", 1),
+        ("name", 5, 1),
+        ("name", None, 1),
+        ("id", "5", 1),
+        ("id", True, 1),
+        ("id", 5.5, 1),
+        ("id", 2**40, 1),
+        ("name", "Full blood count", "7"),
+        ("name", "Full blood count", 2**40),
+    ],
+)
+def test_invalid_cursors(sort, value, id):
+    column = getattr(test_model.TestDB, sort)
+    with pytest.raises(HTTPException) as error:
+        paging.decode_cursor(make_cursor(value, id), column)
+    assert error.value.status_code == 400
+
+
+def test_malformed_cursor():
+    with pytest.raises(HTTPException) as error:
+        paging.decode_cursor("not a cursor", test_model.TestDB.id)
+    assert error.value.status_code == 400
@@ -0,0 +1,170 @@
+"""
+The pre-built serializers must produce the same bytes as FastAPI's
+response_model path for the same ORM objects.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main  # noqa: F401, configures every mapper
+from helpers import serializers
+from models.lab_model import LabDB, LabWithDetail
+from models.reagent_model import ReagentDB, ReagentWithDetail
+from models import test_model
+from models.user_model import UserDB, UserWithDetail
+
+STAMP = datetime(2025, 3, 1, 8, 30, 15, 123456, tzinfo=timezone(timedelta(hours=2)))
+
+
+def make_user(id: int, fname: str) -> UserDB:
+    return UserDB(
+        id=id,
+        code=None,
+        type=1,
+        fname=fname,
+        lname="Mwansa",
+        position="Analyst",
+        email=f"user{id}@example.com",
+        mobile_code="+260",
+        mobile="260977000000",
+        address_physical="Rhodes Park, Lusaka",
+        address_postal=None,
+        role=1,
+        password="$argon2id$v=19$m=65536,t=3,p=4$c2FsdA$aGFzaA",
+        status_id=1,
+        stage_id=1,
+        approval_levels=2,
+        created_at=STAMP,
+        created_by="System",
+        updated_at=None,
+        updated_by=None,
+    )
+
+
+def make_objects():
+    user = make_user(1, "Zoë")
+    lab = LabDB(
+        id=1,
+        user_id=1,
+        name="Hématologie ✓",
+        description="Unicode – ü ß 漢字",
+        created_at=STAMP,
+        created_by="System",
+        updated_at=STAMP,
+        updated_by="Zoë",
+    )
+    lab.user = user
+
+    tests = []
+    # exponent floats, ints stored in float columns, negative zero
+    for id, annual_shift, average_volume in (
+        (1, 1e-07, 100),
+        (2, 1.5e20, 0.1 + 0.2),
+        (3, 3, -0.0),
+    ):
+        test = test_model.TestDB(
+            id=id,
+            user_id=1,
+            lab_id=1,
+            name=f"Full blood count {id} – µl",
+            description=None,
+            reagent_list=[{"id": 1, "name": "Réactif", "percent_volume": 12.5}],
+            instrument_list=[{"id": 2, "percent_volume": 1e-05}],
+            annual_credit=10,
+            annual_nhima=20,
+            annual_research=30,
+            annual_walkins=40,
+            annual_shift=annual_shift,
+            annual_total=100,
+            sites_no=1,
+            staff_no=2,
+            runs_day_week=5,
+            runs_shift_day=1,
+            runs_annual=260,
+            runs_average_volume=average_volume,
+            created_at=STAMP,
+            created_by="System",
+            updated_at=None,
+            updated_by=None,
+        )
+        test.user = user
+        test.lab = lab
+        tests.append(test)
+
+    return [user], [lab], tests
+
+
+def make_client(schema, objects) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/model", response_model=List[schema])
+    async def by_model():
+        return objects
+
+    @app.get("/serializer")
+    async def by_serializer():
+        return serializers.json_response(serializers.serialize_all(objects, schema))
+
+    return TestClient(app)
+
+
+def assert_same_bytes(schema, objects):
+    client = make_client(schema, objects)
+    expected = client.get("/model")
+    actual = client.get("/serializer")
+
+    assert expected.status_code == actual.status_code == 200
+    assert actual.content == expected.content
+    assert actual.headers["content-type"] == expected.headers["content-type"]
+
+
+def test_users_match_response_model():
+    users, _, _ = make_objects()
+    assert_same_bytes(UserWithDetail, users)
+
+
+def test_labs_with_nested_user_match_response_model():
+    _, labs, _ = make_objects()
+    assert_same_bytes(LabWithDetail, labs)
+
+
+def test_tests_with_nested_user_and_lab_match_response_model():
+    _, _, tests = make_objects()
+    assert_same_bytes(test_model.TestWithDetail, tests)
+
+
+def test_reagents_with_int_costs_match_response_model():
+    user = make_user(1, "Zoë")
+    reagents = []
+    for id, cost in ((1, 250), (2, 2.5e-06), (3, 1234567.891)):
+        reagent = ReagentDB(
+            id=id,
+            user_id=1,
+            name=f"Réactif {id}",
+            description=None,
+            cost=cost,
+            expiry_period=30,
+            generic_reagent_unit="µl",
+            quantity_per_gru=1,
+            tests_per_gru=50,
+            created_at=STAMP,
+            created_by="System",
+            updated_at=None,
+            updated_by=None,
+        )
+        reagent.user = user
+        reagents.append(reagent)
+
+    assert_same_bytes(ReagentWithDetail, reagents)
+
+
+def test_float_columns_holding_ints_are_floats():
+    _, _, tests = make_objects()
+    item = serializers.serialize_all(tests, test_model.TestWithDetail)[0]
+
+    assert item["runs_average_volume"] == 100.0
+    assert isinstance(item["runs_average_volume"], float)
+    assert b'"runs_average_volume":100.0' in serializers.dumps(item)